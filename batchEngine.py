@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# Vectorized engine that plays many games of Pairs in lockstep with NumPy
+'''
+batchEngine.py
+Plays a batch of K games at once. Every game is held as NumPy arrays
+(stack rank-counts, scores, cards in points, deck counts and the player on
+turn) and all unfinished games advance one turn per step: draws, pairs,
+folds and the standard-variant redeal are all array operations.
+
+Strategies take part by defining playBatch(state), which gets a BatchState
+describing the player on turn in a number of games and returns a boolean
+array, True to fold for the best card and False to hit. FixFoldStrategy,
+NoCardKnowledge, expValue and PureExp implement it.
+
+The rules follow Dealer.play.
+'''
+from __future__ import division
+import hashlib
+import random
+import numpy as np
+
+# RANKS[r] == r, which is also the number of cards of rank r in a full deck
+RANKS = np.arange(11)
+
+class BatchState:
+    """The state of the player on turn in each game of a batch, as arrays
+    indexed by game. Ranks index the last axis of `stack` and `deck`, so
+    `stack[:, 7]` is the number of sevens each player holds."""
+
+    def __init__(self, engine, games):
+        cur = engine.cur[games]
+        self.noPlayers = engine.P
+        self.target = engine.target
+        self.stack = engine.stacks[games, cur]
+        self.scores = engine.scores[games]
+        self.score = self.scores[np.arange(len(games)), cur]
+        self.best = engine.best[games]
+        self.deck = engine.deck[games]
+        self.deckSize = engine.deckSize[games]
+
+    @property
+    def stackLen(self):
+        return self.stack.sum(1)
+
+    @property
+    def stackSum(self):
+        return (self.stack * RANKS).sum(1)
+
+    @property
+    def stackMean(self):
+        return self.stackSum / np.maximum(self.stackLen, 1)
+
+    @property
+    def highCard(self):
+        return 10 - (self.stack[:, :0:-1] > 0).argmax(1)
+
+    @property
+    def evHit(self):
+        """Expected points of a pair from the next card."""
+        return (self.stack * RANKS * self.deck).sum(1) / self.deckSize
+
+class BatchDealer:
+    """Plays `games` games of `noPlayers` players in lockstep.
+
+    `seats[k, j]` is the index in `strategies` of the strategy in seat j of
+    game k; by default every game gets a random permutation of the first
+    noPlayers strategies.
+
+    >>> from strategies.alexStrategies import FixFoldStrategy
+    >>> d = BatchDealer([FixFoldStrategy(2), FixFoldStrategy(4)], 200,
+    ...                 standard = True, seed = 1)
+    >>> losers = d.play()
+    >>> len(losers), set(losers) <= {0, 1}
+    (200, True)
+    >>> (d.scores.max(1) >= d.target).all()
+    True
+    >>> (d.deck >= 0).all()
+    True
+    """
+
+    def __init__(self, strategies, games, noPlayers = None, standard = False,
+                 calamity = False, seed = None, seats = None, burn = 5):
+        self.strategies = strategies
+        self.K = games
+        self.P = len(strategies) if noPlayers is None else noPlayers
+        self.standard = standard
+        self.calamity = calamity
+        self.burn = burn
+        self.rng = np.random.default_rng(_seed(seed))
+        self.target = max(int(60 / self.P) + 1, 11)
+        if seats is None:
+            seats = self.rng.random((games, self.P)).argsort(1)
+        self.seats = seats
+        self.stacks = np.zeros((games, self.P, 11), int)
+        self.scores = np.zeros((games, self.P), int)
+        self.points = np.zeros((games, 11), int)
+        self.deck = np.tile(RANKS, (games, 1))
+        self.deckSize = np.full(games, 55)
+        self.best = np.zeros(games, int)
+        self.alive = np.ones(games, bool)
+        self.loser = np.full(games, -1)
+        self.cur = self._redeal(np.arange(games))
+
+    def play(self):
+        """Play every game to the end and return the losing seat of each."""
+        while self.alive.any():
+            self._turn()
+        return self.loser
+
+    def losers(self):
+        """The index in `strategies` of each game's loser."""
+        return self.seats[np.arange(self.K), self.loser]
+
+    def _turn(self):
+        g = np.flatnonzero(self.alive)
+        cur = self.cur[g]
+        mins = np.where(self.stacks[g] > 0, RANKS, 11).min(2)
+        lowest = mins.min(1)
+        pre = self.scores[g, cur]
+        empty = self.stacks[g, cur].sum(1) == 0
+        forced = (lowest == 11) | empty | (lowest + pre >= self.target)
+        self.best[g] = np.minimum(lowest, 10)
+
+        fold = np.zeros(len(g), bool)
+        ask = np.flatnonzero(~forced)
+        strat = self.seats[g[ask], cur[ask]]
+        for i, s in enumerate(self.strategies):
+            sel = ask[strat == i]
+            if len(sel):
+                fold[sel] = s.playBatch(BatchState(self, g[sel]))
+
+        f = np.flatnonzero(fold)
+        if len(f):
+            # take the best card from the nearest player to the right
+            right = (cur[f, None] - np.arange(1, self.P + 1)) % self.P
+            has = mins[f[:, None], right] == lowest[f, None]
+            victim = right[np.arange(len(f)), has.argmax(1)]
+            self.stacks[g[f], victim, lowest[f]] -= 1
+            self._catch(g[f], cur[f], lowest[f])
+
+        cal = np.zeros(len(g), bool)
+        h = np.flatnonzero(~fold)
+        if len(h):
+            cards = self._draw(g[h])
+            paired = self.stacks[g[h], cur[h], cards] > 0
+            p = h[paired]
+            self._catch(g[p], cur[p], cards[paired])
+            n = h[~paired]
+            self.stacks[g[n], cur[n], cards[~paired]] += 1
+            if self.calamity:
+                cal[n] = cards[~paired] == 7
+
+        post = self.scores[g, cur]
+        over = post >= self.target
+        self.loser[g[over]] = cur[over]
+        self.alive[g[over]] = False
+        nxt = cur.copy()
+        if self.standard:
+            r = np.flatnonzero((pre < post) & ~over)
+            if len(r):
+                nxt[r] = self._redeal(g[r]) - 1
+        nxt[cal] -= 1
+        self.cur[g] = (nxt + 1) % self.P
+
+    def _catch(self, g, c, cards):
+        self.stacks[g, c] = 0
+        self.scores[g, c] += cards
+        self.points[g, cards] += 1
+
+    def _draw(self, g):
+        """Draw one card in each of the games g, reshuffling where needed."""
+        low = g[self.deckSize[g] <= self.burn]
+        if len(low):
+            self.deck[low] = (RANKS - self.stacks[low].sum(1) -
+                              self.points[low])
+            self.deckSize[low] = self.deck[low].sum(1)
+        x = (self.rng.random(len(g)) * self.deckSize[g]).astype(int)
+        cards = (self.deck[g].cumsum(1) > x[:, None]).argmax(1)
+        self.deck[g, cards] -= 1
+        self.deckSize[g] -= 1
+        return cards
+
+    def _sumC(self, g):
+        total = (self.stacks[g] * RANKS).sum(2)
+        if self.calamity:
+            total -= 7 * (self.stacks[g, :, 7] > 0)
+        return total
+
+    def _redeal(self, g):
+        """Deal a new card to every player in the games g and return the
+        first player of each; tied low players draw until the tie breaks."""
+        self.stacks[g] = 0
+        for j in range(self.P):
+            self.stacks[g, j, self._draw(g)] += 1
+        value = self._sumC(g)
+        tied = value == value.min(1, keepdims = True)
+        multi = np.flatnonzero(tied.sum(1) > 1)
+        while len(multi):
+            for j in range(self.P):
+                sel = g[multi[tied[multi, j]]]
+                while len(sel):
+                    cards = self._draw(sel)
+                    self.stacks[sel, j, cards] += 1
+                    # a pair is discarded and replaced
+                    pair = self.stacks[sel, j, cards] > 1
+                    self.stacks[sel[pair], j, cards[pair]] -= 1
+                    sel = sel[pair]
+            # start over where a stack has grown to five cards
+            over = (self.stacks[g[multi]].sum(2) >= 5).any(1)
+            if over.any():
+                first = self._redeal(g[multi[over]])
+                tied[multi[over]] = np.arange(self.P) == first[:, None]
+                multi = multi[~over]
+            value = np.where(tied[multi], self._sumC(g[multi]), 100)
+            tied[multi] &= value == value.min(1, keepdims = True)
+            multi = multi[tied[multi].sum(1) > 1]
+        return tied.argmax(1)
+
+def playGames(strats, games, seed = None, standard = True, calamity = False,
+              batch = None):
+    """Play `games` games between the strategies in the dict strats, in
+    random seats, `batch` games at a time, and return the losses of each
+    key like Tourney.lost. Without a seed a random one is drawn, as
+    Tourney does."""
+    keys = list(strats.keys())
+    missing = [k for k in keys if not hasattr(strats[k], 'playBatch')]
+    if missing:
+        raise TypeError('No playBatch method for: ' + ', '.join(missing))
+    batch = batch or games
+    if seed is None:
+        seed = random.getrandbits(32)
+    lost = dict.fromkeys(keys, 0)
+    for start in range(0, games, batch):
+        d = BatchDealer([strats[k] for k in keys], min(batch, games - start),
+                        standard = standard, calamity = calamity,
+                        seed = '%s-%d' % (seed, start))
+        d.play()
+        counts = np.bincount(d.losers(), minlength = len(keys))
+        for i, k in enumerate(keys):
+            lost[k] += int(counts[i])
+    return lost
+
+def _seed(seed):
+    """An integer seed for NumPy from any seed random.Random accepts."""
+    if seed is None or isinstance(seed, int):
+        return seed
+    return int(hashlib.sha256(str(seed).encode()).hexdigest(), 16)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
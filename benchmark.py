@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+# Throughput and latency benchmarks for the engine and the strategies
+'''
+benchmark.py
+Times the game engine and the strategies at several layers:
+
+    engine      Dealer.play games/sec, 2 to 8 players, in the standard,
+                continuous and calamity variants
+    strategies  latency percentiles of play() for every strategy in
+                strategies/ that can be built without arguments
+    micro       draw, bestFold, whichPair, redeal and snapshot, the best
+                of 5 runs
+    tourney     end-to-end Tourney and GrandTourney games/sec
+
+Results are printed as a table and can be written as JSON. Given a
+baseline (the JSON of an earlier run) every metric is compared with it,
+and the exit status is 1 if any got worse by more than the tolerance
+(at least 30% for times under a microsecond, which are noisier):
+
+    python benchmark.py --output base.json
+    python benchmark.py --baseline base.json --tolerance 0.15
+
+Timings depend on the machine, so only compare runs made on the same one.
+'''
+from __future__ import division
+import argparse
+import inspect
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import redirect_stdout
+import timeit
+
+import pairsClasses as p
+
+SECTIONS = ('engine', 'strategies', 'micro', 'tourney')
+MODES = {'standard': dict(standard = True),
+         'continuous': dict(standard = False),
+         'calamity': dict(standard = True, calamity = True)}
+STRATEGY_MODULES = ('alexStrategies', 'brianStrategies', 'chrisStrategies',
+                    'daveStrategies', 'DannisStrategy', 'michaelStrategies')
+# strategies that wait for a person
+SKIP = {'Interactive'}
+# the least allowed slowdown of a time under a microsecond
+SHORT_TOLERANCE = 0.3
+
+def _metric(value, unit, better):
+    return {'value': value, 'unit': unit, 'better': better}
+
+def _seat(d, strategies):
+    for j, player in enumerate(d.gameState.players):
+        player.strategy = strategies[j % len(strategies)]
+
+def benchEngine(games):
+    """Games per second of Dealer.play with FixFoldStrategy in every seat."""
+    from strategies.alexStrategies import FixFoldStrategy
+    results = {}
+    for mode, kwargs in MODES.items():
+        for n in range(2, 9):
+            start = time.perf_counter()
+            for g in range(games):
+                d = p.Dealer(n, seed = 'bench-%d' % g, **kwargs)
+                _seat(d, [FixFoldStrategy(3), FixFoldStrategy(5)])
+                d.play()
+            rate = games / (time.perf_counter() - start)
+            results['engine.%s.%dp' % (mode, n)] = _metric(rate, 'games/s',
+                                                           'higher')
+    return results
+
+class _Collector:
+    """Hits every turn, keeping a snapshot of each state it was asked
+    about."""
+    def __init__(self, states):
+        self.states = states
+
+    def play(self, info):
+        self.states.append((info.snapshot(), self.player._index))
+        return 'hit'
+
+def _states(games, players = (2, 3, 5)):
+    states = []
+    for n in players:
+        for g in range(games):
+            d = p.Dealer(n, standard = True, seed = 'states-%d-%d' % (n, g))
+            _seat(d, [_Collector(states)])
+            d.play()
+    return states
+
+def _strategies():
+    """(name, instance) for every strategy class that needs no arguments."""
+    found = []
+    for module in STRATEGY_MODULES:
+        m = importlib.import_module('strategies.' + module)
+        for name, cls in inspect.getmembers(m, inspect.isclass):
+            if (cls.__module__ != m.__name__ or name in SKIP or
+                    not hasattr(cls, 'play')):
+                continue
+            try:
+                found.append(('%s.%s' % (module, name), cls()))
+            except TypeError:
+                pass
+    return found
+
+def _percentile(times, q):
+    return times[min(int(q * len(times)), len(times) - 1)]
+
+def benchStrategies(games):
+    """Percentiles of the time each strategy's play() takes, over the same
+    states collected from real games."""
+    states = _states(games)
+    results = {}
+    for name, strategy in _strategies():
+        times = []
+        errors = 0
+        for info, index in states:
+            view = info.snapshot()
+            strategy.player = view.players[index]
+            start = time.perf_counter()
+            try:
+                strategy.play(view)
+            except Exception:
+                errors += 1
+                continue
+            times.append(time.perf_counter() - start)
+        if not times:
+            continue
+        times.sort()
+        for q in (0.5, 0.9, 0.99):
+            results['strategy.%s.p%d' % (name, round(q * 100))] = _metric(
+                _percentile(times, q) * 1e6, 'us', 'lower')
+        if errors:
+            results['strategy.%s.errors' % name] = _metric(errors, 'calls',
+                                                           'lower')
+    return results
+
+def _microDealer():
+    d = p.Dealer(5, seed = 'micro')
+    d.deal()
+    info = d.gameState
+    for player in info.players:
+        player.hit(info.draw())
+    return d
+
+def benchMicro(number, repeat = 5):
+    """Time per call of the engine's inner operations, the best of
+    `repeat` runs. draw is timed on freshly dealt decks, each only until it
+    would be reshuffled, so that it does not time reshuffles."""
+    d = _microDealer()
+    info = d.gameState
+    player = p.Player(0)
+    player.stack = [2, 5, 9, 4]
+    calls = {'bestFold': lambda: info.bestFold(info.players[0]),
+             'whichPair': player.whichPair,
+             'redeal': d.redeal,
+             'snapshot': info.snapshot}
+    results = {}
+    for name, call in calls.items():
+        t = min(timeit.repeat(call, number = number, repeat = repeat))
+        results['micro.%s' % name] = _metric(t / number * 1e9, 'ns', 'lower')
+    best = None
+    for r in range(repeat):
+        t = drawn = 0
+        while drawn < number:
+            info = _microDealer().gameState
+            n = len(info.deck) - info.burn
+            t += timeit.timeit(info.draw, number = n)
+            drawn += n
+        best = t / drawn if best is None else min(best, t / drawn)
+    results['micro.draw'] = _metric(best * 1e9, 'ns', 'lower')
+    return results
+
+def benchTourney(games):
+    """Games per second played by a Tourney and by a GrandTourney (whose
+    reports are discarded), serially and without stopping early."""
+    import tourney
+    from strategies.alexStrategies import FixFoldStrategy
+    from strategies.chrisStrategies import PureExp
+    from strategies.daveStrategies import expValue
+
+    def field():
+        strats = {'Fix': FixFoldStrategy(), 'Pure': PureExp(),
+                  'Exp': expValue()}
+        for key, value in strats.items():
+            value.tourney_key = key
+        return strats
+
+    results = {}
+    start = time.perf_counter()
+    tourney.Tourney(field(), games, check = games, prob = 1.0,
+                    seed = 'bench', verbose = False).play()
+    results['tourney.Tourney'] = _metric(
+        games / (time.perf_counter() - start), 'games/s', 'higher')
+
+    grand = tourney.GrandTourney(field(), games, check = games, prob = 1.0,
+                                 seed = 'bench')
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        grand.play()
+    played = games * len(grand.results)
+    results['tourney.GrandTourney'] = _metric(
+        played / (time.perf_counter() - start), 'games/s', 'higher')
+    return results
+
+def compare(results, baseline, tolerance):
+    """Lines describing each metric against the baseline, and the names of
+    those that regressed by more than the tolerance. Times under a
+    microsecond vary more from run to run, so they are allowed at least
+    SHORT_TOLERANCE."""
+    lines, regressed = [], []
+    for name, m in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]['value']
+        if not old:
+            continue
+        change = m['value'] / old - 1
+        worse = -change if m['better'] == 'higher' else change
+        allowed = tolerance
+        if m['unit'] == 'ns' and old < 1000:
+            allowed = max(tolerance, SHORT_TOLERANCE)
+        flag = ''
+        if worse > allowed:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        lines.append('%-56s %12.2f %12.2f %+7.1f%%%s' %
+                     (name, old, m['value'], change * 100, flag))
+    return lines, regressed
+
+def run(sections, quick = False):
+    scale = 1 if quick else 5
+    results = {}
+    if 'engine' in sections:
+        results.update(benchEngine(40 * scale))
+    if 'strategies' in sections:
+        results.update(benchStrategies(4 * scale))
+    if 'micro' in sections:
+        results.update(benchMicro(4000 * scale))
+    if 'tourney' in sections:
+        results.update(benchTourney(100 * scale))
+    return results
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[2])
+    parser.add_argument('sections', nargs = '*', metavar = 'section',
+                        help = 'any of %s (default: all)' %
+                               ', '.join(SECTIONS))
+    parser.add_argument('--quick', action = 'store_true',
+                        help = 'fewer games and calls, for a rough check')
+    parser.add_argument('--output', help = 'write the results as JSON here')
+    parser.add_argument('--baseline', help = 'JSON of an earlier run')
+    parser.add_argument('--tolerance', type = float, default = 0.1,
+                        help = 'allowed slowdown as a fraction '
+                               '(default: 0.1)')
+    args = parser.parse_args(argv)
+    for section in args.sections:
+        if section not in SECTIONS:
+            parser.error('unknown section: %s' % section)
+    sections = args.sections or SECTIONS
+
+    results = run(sections, args.quick)
+    for name, m in results.items():
+        print('%-56s %12.2f %s' % (name, m['value'], m['unit']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'quick': args.quick,
+                       'results': results}, f, indent = 1, sort_keys = True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print('\n%-56s %12s %12s %8s' % ('', 'baseline', 'now', 'change'))
+        for line in lines:
+            print(line)
+        if regressed:
+            print('\n%d of %d metrics regressed by more than %d%%.' %
+                  (len(regressed), len(lines), args.tolerance * 100))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
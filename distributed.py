@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Runs tourney work units on worker processes connected over sockets
+'''
+distributed.py
+A Coordinator hands work units to workers that connect to it over TCP or a
+Unix socket, from this machine or any other that has this code. It has the
+map and imap_unordered methods of a multiprocessing Pool, so Tourney and
+GrandTourney use it in place of one:
+
+    c = Coordinator(('0.0.0.0', 6000), authkey = b'a long random secret')
+    Tourney(strategies, workers = 16, cluster = c).play()
+
+and on each node
+
+    python distributed.py worker HOST:6000 'a long random secret'
+
+Tourney splits every round of `check` games into units of consecutive games
+(at least one per worker) and applies its stopping rule to the merged
+losses after each round; GrandTourney sends one subset per unit. Units and
+strategies travel pickled, so a worker plays with its own instances.
+
+A worker that disconnects, by crashing or being killed, has its unit
+handed to the next free worker.
+
+Both ends unpickle what the other sends, so anyone who can connect with
+the authkey can run code on them. The well-known default key is only
+allowed on loopback addresses and Unix sockets; any other address needs
+an authkey of your own.
+'''
+import ipaddress
+import queue
+import threading
+import traceback
+from multiprocessing.connection import Client, Listener
+
+# only for loopback addresses and Unix sockets
+AUTHKEY = b'pairs'
+
+def _authkey(address, authkey):
+    """authkey, or the default one if address is local.
+
+    >>> _authkey(('127.0.0.1', 6000), None) == AUTHKEY
+    True
+    >>> _authkey(('0.0.0.0', 6000), None)
+    Traceback (most recent call last):
+    ...
+    ValueError: An authkey of your own is needed for ('0.0.0.0', 6000).
+    """
+    if authkey is not None:
+        return authkey
+    if isinstance(address, tuple):
+        host = address[0]
+        try:
+            local = (host == 'localhost' or
+                     ipaddress.ip_address(host).is_loopback)
+        except ValueError:
+            local = False
+        if not local:
+            raise ValueError('An authkey of your own is needed for %s.' %
+                             (address,))
+    return AUTHKEY
+
+def parseAddress(address):
+    """HOST:PORT as a (host, port) pair; anything else is a Unix socket
+    path.
+
+    >>> parseAddress('localhost:6000'), parseAddress('/tmp/pairs.sock')
+    (('localhost', 6000), '/tmp/pairs.sock')
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host, int(port))
+    return address
+
+class Coordinator:
+    """Listens at `address` and runs units on whatever workers connect.
+
+    >>> from multiprocessing import Process
+    >>> c = Coordinator()
+    >>> workers = [Process(target = work, args = (c.address,))
+    ...            for i in range(2)]
+    >>> for w in workers:
+    ...     w.start()
+    >>> c.map(abs, [-3, 1, -2])
+    [3, 1, 2]
+    >>> c.close()
+    >>> for w in workers:
+    ...     w.join()
+    """
+    def __init__(self, address = ('localhost', 0), authkey = None):
+        self._listener = Listener(address,
+                                  authkey = _authkey(address, authkey))
+        self.address = self._listener.address
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._closed = False
+        threading.Thread(target = self._accept, daemon = True).start()
+
+    def size(self):
+        """The number of workers connected."""
+        return self._workers
+
+    def map(self, func, iterable, chunksize = None):
+        """func applied to each item on the workers, in order."""
+        results = dict(self._run(func, iterable))
+        return [results[i] for i in range(len(results))]
+
+    def imap_unordered(self, func, iterable, chunksize = 1):
+        """func applied to each item on the workers, as they finish."""
+        for i, result in self._run(func, iterable):
+            yield result
+
+    def close(self):
+        """Tell the workers to stop and stop listening."""
+        self._closed = True
+        # each worker passes the None on to the next, including any that
+        # connect later
+        self._pending.put(None)
+        self._listener.close()
+
+    def _run(self, func, iterable):
+        results = queue.Queue()
+        n = 0
+        for i, item in enumerate(iterable):
+            self._pending.put((func, item, i, results))
+            n += 1
+        for k in range(n):
+            i, ok, value = results.get()
+            if not ok:
+                raise RuntimeError('A unit failed on a worker:\n' + value)
+            yield i, value
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                continue
+            threading.Thread(target = self._serve, args = (conn,),
+                             daemon = True).start()
+
+    def _serve(self, conn):
+        """Feed units to one worker until it disconnects or is stopped."""
+        with self._lock:
+            self._workers += 1
+        try:
+            while True:
+                unit = self._pending.get()
+                if unit is None:
+                    self._pending.put(None)
+                    conn.send(None)
+                    return
+                func, item, i, results = unit
+                try:
+                    conn.send((func, item))
+                    ok, value = conn.recv()
+                except (EOFError, OSError):
+                    # the worker is gone; someone else gets its unit
+                    self._pending.put(unit)
+                    return
+                results.put((i, ok, value))
+        finally:
+            with self._lock:
+                self._workers -= 1
+            conn.close()
+
+def work(address, authkey = None, retries = 20):
+    """Connect to a Coordinator and run its units until told to stop."""
+    import time
+    authkey = _authkey(address, authkey)
+    for attempt in range(retries):
+        try:
+            conn = Client(address, authkey = authkey)
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.5)
+    else:
+        raise ConnectionRefusedError('No coordinator at %s' % (address,))
+    try:
+        while True:
+            try:
+                unit = conn.recv()
+            except EOFError:
+                return
+            if unit is None:
+                return
+            func, item = unit
+            try:
+                reply = (True, func(item))
+            except Exception:
+                reply = (False, traceback.format_exc())
+            conn.send(reply)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 2 and sys.argv[1] == 'worker':
+        key = sys.argv[3].encode() if len(sys.argv) > 3 else None
+        work(parseAddress(sys.argv[2]), key)
+    elif len(sys.argv) > 1:
+        print('usage: python distributed.py worker ADDRESS [AUTHKEY]')
+    else:
+        import doctest
+        doctest.testmod()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Events a Dealer announces to its observers while it plays
+'''
+gameEvents.py
+The events of a game of Pairs and their payloads. An observer is any
+object with one or more of the methods in EVENTS; Dealer.subscribe
+registers it, and each of its methods is called with the payload of that
+event. A Dealer only builds a payload (and times a phase) when something
+is subscribed to the event, so a game nobody watches pays nothing.
+
+    on_game      GameEvent       the cards are dealt
+    on_decision  DecisionEvent   a Strategy has replied
+    on_hit       HitEvent        a card was drawn and did not pair
+    on_pair      HitEvent        a card was drawn and paired
+    on_fold      FoldEvent       a player folded for a card
+    on_redeal    RedealEvent     new cards were dealt after points scored
+    on_reshuffle ReshuffleEvent  the deck was reshuffled
+    on_turn      TurnEvent       a turn is over (after any redeal)
+    on_end       EndEvent        the game is over
+
+Payloads are named tuples. Stacks in them are tuples, copied when the
+event happens.
+'''
+from collections import namedtuple
+
+EVENTS = ('on_game', 'on_decision', 'on_hit', 'on_pair', 'on_fold',
+          'on_redeal', 'on_reshuffle', 'on_turn', 'on_end')
+
+# players: the Dealer's (live) Player objects; first: the seat to start
+GameEvent = namedtuple('GameEvent', 'players first')
+# cpu and wall: seconds spent in the Strategy's play
+DecisionEvent = namedtuple('DecisionEvent', 'seat strategy reply cpu wall')
+# wall: seconds spent drawing the card
+HitEvent = namedtuple('HitEvent', 'seat card forced stack score wall')
+# target: the seat folded from
+FoldEvent = namedtuple('FoldEvent', 'seat target card stack score')
+# before and after: every player's stack; wall: seconds spent redealing
+RedealEvent = namedtuple('RedealEvent', 'before after first wall')
+# reshuffles: how many times the deck has been reshuffled
+ReshuffleEvent = namedtuple('ReshuffleEvent', 'reshuffles')
+# card is 0 on a fold, foldFrom (-1, 0) on a hit
+TurnEvent = namedtuple('TurnEvent',
+                       'seat forced card foldFrom before after')
+EndEvent = namedtuple('EndEvent', 'loser scores')
+
+class VerbosePrinter:
+    """Prints a running commentary of the game; Dealer(verbose = True)
+    subscribes one."""
+
+    def _stacks(self, stacks):
+        for i, stack in enumerate(stacks):
+            print('Player ' + str(i) + ' stack:')
+            print(list(stack))
+
+    def on_game(self, e):
+        for i, player in enumerate(e.players):
+            print('Player ' + str(i) + '\'s stack: ' + str(player.stack))
+
+    def on_decision(self, e):
+        print('Player ' + str(e.seat) + ' replied ' + str(e.reply))
+
+    def on_hit(self, e):
+        self._drew(e, 'You just hit for ')
+
+    def on_pair(self, e):
+        self._drew(e, 'You just paired for ')
+
+    def _drew(self, e, what):
+        if e.forced:
+            print('Player ' + str(e.seat) + ' was forced to hit.')
+        print('No valid fold option given.')
+        print(what + str(e.card) + ' Your stack: ' + str(list(e.stack)) +
+              ' Your score: ' + str(e.score))
+
+    def on_fold(self, e):
+        print('You just folded for ' + str(e.card) + ' Your stack: ' +
+              str(list(e.stack)) + ' Your score: ' + str(e.score))
+
+    def on_redeal(self, e):
+        print('Standard: Points earned, dealing new cards to all players. '
+              'Pre stacks:')
+        self._stacks(e.before)
+        print('Post stacks:')
+        self._stacks(e.after)
+        print('Player ' + str(e.first) + ' now goes first.')
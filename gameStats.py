@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# Opt-in counters and timers for the games a Dealer plays
+'''
+gameStats.py
+Counts what happens in the games a Dealer plays (turns, decisions, forced
+hits, folds, hits, pairs, redeals and reshuffles), times the phases of
+play (deciding, drawing, redealing and whole games) and keeps the CPU time
+each strategy spends deciding, by tourney_key.
+
+Instrument a game with
+    stats = GameStats()
+    Dealer(3, stats = stats).play()
+or a tourney with Tourney(..., stats = True), which adds a "ms/decision"
+column to its summaries. GameStats is an observer of the Dealer's events
+(see gameEvents); a Dealer without observers does none of this work.
+'''
+import time
+
+COUNTERS = ('games', 'turns', 'decisions', 'forced', 'folds', 'hits',
+            'pairs', 'redeals', 'reshuffles')
+TIMERS = ('decide', 'draw', 'redeal', 'game')
+
+class GameStats:
+    """Counters, phase times (wall clock seconds) and CPU seconds spent in
+    each strategy's play.
+
+    >>> from pairsClasses import Dealer
+    >>> stats = GameStats()
+    >>> for g in range(20):
+    ...     loser = Dealer(3, standard = True, seed = g, stats = stats).play()
+    >>> stats.counts['games']
+    20
+    >>> c = stats.counts
+    >>> c['turns'] == c['decisions'] + c['forced'] == c['folds'] + c['hits']
+    True
+    >>> sum(stats.decisions.values()) == c['decisions']
+    True
+    >>> stats.msPerDecision('SimpletonStrategy') < 1
+    True
+    """
+    def __init__(self):
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.times = dict.fromkeys(TIMERS, 0.0)
+        self.cpu = {}
+        self.decisions = {}
+        self._start = None
+
+    def on_game(self, e):
+        self._start = time.perf_counter()
+
+    def on_decision(self, e):
+        key = getattr(e.strategy, 'tourney_key', type(e.strategy).__name__)
+        self.cpu[key] = self.cpu.get(key, 0.0) + e.cpu
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        self.counts['decisions'] += 1
+        self.times['decide'] += e.wall
+
+    def on_hit(self, e):
+        self.times['draw'] += e.wall
+
+    on_pair = on_hit
+
+    def on_redeal(self, e):
+        self.counts['redeals'] += 1
+        self.times['redeal'] += e.wall
+
+    def on_reshuffle(self, e):
+        self.counts['reshuffles'] += 1
+
+    def on_turn(self, e):
+        counts = self.counts
+        counts['turns'] += 1
+        if e.forced:
+            counts['forced'] += 1
+        if e.card:
+            counts['hits'] += 1
+            if e.after > e.before:
+                counts['pairs'] += 1
+        else:
+            counts['folds'] += 1
+
+    def on_end(self, e):
+        self.counts['games'] += 1
+        self.times['game'] += time.perf_counter() - self._start
+
+    def merge(self, other):
+        """Add the counts and times of another GameStats, e.g. one filled in
+        by a worker process."""
+        for key in other.counts:
+            self.counts[key] += other.counts[key]
+        for key in other.times:
+            self.times[key] += other.times[key]
+        for key in other.cpu:
+            self.cpu[key] = self.cpu.get(key, 0.0) + other.cpu[key]
+            self.decisions[key] = (self.decisions.get(key, 0) +
+                                   other.decisions[key])
+
+    def msPerDecision(self, key):
+        """Mean CPU milliseconds per decision of the strategy with this key,
+        or None if it has not decided yet."""
+        if not self.decisions.get(key):
+            return None
+        return self.cpu[key] / self.decisions[key] * 1000
+
+    def report(self):
+        """Lines summarizing the counts and where the time went."""
+        c, t = self.counts, self.times
+        games = max(c['games'], 1)
+        lines = ['Per game: %s' % ', '.join(
+            ['%.1f %s' % (c[key] / games, key) for key in COUNTERS[1:]])]
+        total = t['game'] or 1
+        lines.append('Time: %.1f s in games; %s' % (t['game'], ', '.join(
+            ['%.0f%% %s' % (100 * t[key] / total, key)
+             for key in TIMERS[:-1]])))
+        return lines
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Binary game traces: one fixed-width record per turn of Dealer.play
+'''
+gameTrace.py
+Records every turn of the games a Dealer plays to an append-only binary
+file and reads the file back, memory-mapped, as a NumPy structured array.
+
+Each 16 byte little-endian record holds the game number, the turn within
+the game, the seat on turn, a digest of the stacks and scores before the
+turn (a sum of random keys for each seat's cards and points, which a turn
+updates from the cards it moved), the decision (HIT, FOLD or FORCED), the
+card drawn (0 on a fold), the seat and card folded for (-1 and 0 on a hit)
+and the score after the turn.
+
+Record games with
+    with TraceRecorder('games.trace') as recorder:
+        Dealer(3, recorder = recorder).play()
+and step through one with
+    python gameTrace.py games.trace 12
+'''
+import os
+import random
+import struct
+
+HIT, FOLD, FORCED = 0, 1, 2
+DECISIONS = {HIT: 'hit', FOLD: 'folded', FORCED: 'was forced to hit'}
+
+RECORD = struct.Struct('<IHBBBbBBI')
+# digest keys: one per seat and rank held, one per seat for each point
+_rng = random.Random('gameTrace')
+_CARD = [[_rng.getrandbits(32) for rank in range(11)] for seat in range(16)]
+_POINT = [_rng.getrandbits(32) for seat in range(16)]
+
+FIELDS = [('game', '<u4'), ('turn', '<u2'), ('seat', 'u1'), ('decision', 'u1'),
+          ('card', 'u1'), ('target', 'i1'), ('foldCard', 'u1'),
+          ('score', 'u1'), ('digest', '<u4')]
+
+class TraceRecorder:
+    """Collects the records of a game in memory and appends them to the file
+    when the next game begins (or on flush/close). It observes a Dealer's
+    on_game and on_turn events (see gameEvents).
+
+    >>> import os, tempfile
+    >>> from pairsClasses import Dealer
+    >>> path = os.path.join(tempfile.mkdtemp(), 'test.trace')
+    >>> with TraceRecorder(path) as r:
+    ...     losers = [Dealer(3, seed = g, recorder = r).play()
+    ...               for g in range(5)]
+    >>> t = TraceReader(path)
+    >>> t.games()
+    [0, 1, 2, 3, 4]
+    >>> last = t.game(2)[-1]
+    >>> int(last['seat']) == losers[2], int(last['score']) >= 21
+    (True, True)
+
+    The running digest is that of the whole table:
+
+    >>> with TraceRecorder(path) as r:
+    ...     d = Dealer(3, seed = 9, recorder = r)
+    ...     loser = d.play()
+    >>> (r._digest & 0xffffffff) == r.digest(d.gameState.players)
+    True
+    """
+    def __init__(self, path, flushBytes = 1 << 16):
+        self.path = path
+        self.flushBytes = flushBytes
+        self._buf = bytearray()
+        self._pack = RECORD.pack
+        self.game = -1
+        self._turn = 0
+        # carry on numbering after the games already in the file
+        if os.path.exists(path) and os.path.getsize(path) >= RECORD.size:
+            with open(path, 'rb') as f:
+                f.seek(-RECORD.size, os.SEEK_END)
+                self.game = RECORD.unpack(f.read(RECORD.size))[0]
+        self._file = open(path, 'ab')
+
+    def on_game(self, e):
+        self.beginGame()
+        self._players = e.players
+        self._rehash()
+
+    def on_turn(self, e):
+        seat, forced, card, foldFrom, before, after = e
+        if card:
+            decision = FORCED if forced else HIT
+        else:
+            decision = FOLD
+        self._buf += self._pack(self.game, self._turn, seat, decision, card,
+                                foldFrom[0], foldFrom[1], after,
+                                self._digest & 0xffffffff)
+        self._turn += 1
+        # the state after this turn is the state before the next: update the
+        # digest with the cards that moved
+        held = self._held
+        if after > before:
+            if self._players[seat]._stack:
+                # the points were followed by a new deal
+                self._rehash()
+                return
+            # a pair or a fold: the stack is thrown in for the points
+            if not card:
+                lost = _CARD[foldFrom[0]][foldFrom[1]]
+                held[foldFrom[0]] -= lost
+                self._digest -= lost
+            self._digest += (after - before) * _POINT[seat] - held[seat]
+            held[seat] = 0
+        else:
+            held[seat] += _CARD[seat][card]
+            self._digest += _CARD[seat][card]
+
+    def _rehash(self):
+        held, digest = [], 0
+        for i, p in enumerate(self._players):
+            keys, h = _CARD[i], 0
+            for c in p._stack:
+                h += keys[c]
+            held.append(h)
+            digest += h + p._score * _POINT[i]
+        self._held, self._digest = held, digest
+
+    def beginGame(self):
+        if len(self._buf) >= self.flushBytes:
+            self.flush()
+        self.game += 1
+        self._turn = 0
+
+    def digest(self, players):
+        """A 32 bit digest of every stack and score."""
+        digest = 0
+        for i, p in enumerate(players):
+            keys = _CARD[i]
+            digest += p._score * _POINT[i] + sum([keys[c] for c in p._stack])
+        return digest & 0xffffffff
+
+    def flush(self):
+        self._file.write(self._buf)
+        self._file.flush()
+        self._buf = bytearray()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TraceReader:
+    """A memory-mapped trace file. `records` is a structured array with the
+    fields in FIELDS, in the order the turns were played."""
+    def __init__(self, path):
+        import numpy as np
+        self.np = np
+        dtype = np.dtype(FIELDS)
+        if os.path.getsize(path) < dtype.itemsize:
+            self.records = np.zeros(0, dtype)
+        else:
+            self.records = np.memmap(path, dtype = dtype, mode = 'r')
+
+    def games(self):
+        return [int(g) for g in self.np.unique(self.records['game'])]
+
+    def game(self, g):
+        """The records of game g."""
+        col = self.records['game']
+        return self.records[col.searchsorted(g, 'left'):
+                            col.searchsorted(g, 'right')]
+
+    def replay(self, g):
+        """Yield a line describing each turn of game g."""
+        for r in self.game(g):
+            line = 'Turn %d: player %d %s' % (r['turn'], r['seat'],
+                                              DECISIONS[r['decision']])
+            if r['decision'] == FOLD:
+                line += ' for %d from player %d' % (r['foldCard'],
+                                                    r['target'])
+            else:
+                line += ' and drew %d' % r['card']
+            yield line + ' (score %d, state %08x)' % (r['score'],
+                                                       r['digest'])
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        reader = TraceReader(sys.argv[1])
+        for g in ([int(sys.argv[2])] if len(sys.argv) > 2 else
+                  reader.games()):
+            print('Game %d' % g)
+            for line in reader.replay(g):
+                print(line)
+    else:
+        import doctest
+        doctest.testmod()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Chooses which tables of a GrandTourney to play next
+'''
+matchmaker.py
+The posterior of the "Overall" indices of a GrandTourney, how sure it is
+of their order, and which tables are worth more games.
+
+Each table's losses have a Dirichlet(prior + losses) posterior on the loss
+shares, so a strategy's index at a table (its share times the table size)
+has a known mean and covariance. Overall is a fixed average of table
+indices: the mean over table sizes of the mean over tables of that size.
+It is therefore approximately normal, with a mean and covariance summed
+from the tables. The order of Overall is trusted when every strategy is
+below the next one in it with probability at least prob.
+
+GrandTourney(adaptive = True) plays `check` games at every table, then
+keeps giving a batch of tables `check` more games. It picks the tables
+whose next games would most raise the confidence of the comparisons not
+yet trusted, and stops once all of them are.
+'''
+from __future__ import division
+import numpy as np
+from sequential import _phi
+
+class Posterior:
+    """Mean and covariance of the Overall indices, given the losses at each
+    table.
+
+    >>> tables = [('a', 'b'), ('a', 'c'), ('b', 'c'), ('a', 'b', 'c')]
+    >>> lost = [[20, 80], [25, 75], [45, 55], [20, 40, 60]]
+    >>> post = Posterior(['a', 'b', 'c'], tables, lost, prior = 5)
+    >>> [round(m, 2) for m in post.mean]
+    [0.53, 1.11, 1.36]
+    >>> order, conf = post.confidence()
+    >>> order, [round(p, 3) for p in conf]
+    (['a', 'b', 'c'], [1.0, 0.973])
+    """
+    def __init__(self, keys, tables, lost, prior):
+        self.keys = list(keys)
+        index = {key: i for i, key in enumerate(self.keys)}
+        n = len(self.keys)
+        # how many tables of each size every strategy sat at
+        seated = {}
+        for table in tables:
+            for s in table:
+                seated.setdefault(s, {})
+                seated[s][len(table)] = seated[s].get(len(table), 0) + 1
+        self.mean = np.zeros(n)
+        self.cov = np.zeros((n, n))
+        # per table: positions of its strategies, their weights in Overall,
+        # covariance of their indices and the posterior's total count
+        self.parts = []
+        for table, losses in zip(tables, lost):
+            k = len(table)
+            a = prior + np.asarray(losses, dtype = float)
+            a0 = a.sum()
+            m = a / a0
+            cov = k * k * (np.diag(m) - np.outer(m, m)) / (a0 + 1)
+            pos = np.array([index[s] for s in table])
+            w = np.array([1 / (len(seated[s]) * seated[s][k]) for s in table])
+            self.mean[pos] += w * k * m
+            self.cov[np.ix_(pos, pos)] += np.outer(w, w) * cov
+            self.parts.append((pos, w, cov, a0))
+
+    def _adjacent(self):
+        """Positions of each strategy and the next in order, the variance
+        and mean of their difference and P(the first is below)."""
+        order = np.argsort(self.mean, kind = 'stable')
+        a, b = order[:-1], order[1:]
+        var = self.cov[a, a] + self.cov[b, b] - 2 * self.cov[a, b]
+        diff = self.mean[b] - self.mean[a]
+        return a, b, var, diff, _phi(diff / np.sqrt(np.maximum(var, 1e-300)))
+
+    def confidence(self):
+        """The keys in order of Overall, best first, and the probability
+        that each is below the next."""
+        order = np.argsort(self.mean, kind = 'stable')
+        return [self.keys[i] for i in order], list(self._adjacent()[4])
+
+    def gains(self, games, prob):
+        """For each table, how much `games` more games there would raise the
+        summed confidence of the adjacent comparisons still below prob,
+        if the means stayed where they are."""
+        a, b, var, diff, now = self._adjacent()
+        open_ = now < prob
+        a, b, var, diff, now = (a[open_], b[open_], var[open_], diff[open_],
+                                now[open_])
+        gains = []
+        for pos, w, cov, a0 in self.parts:
+            # the comparisons' contrasts restricted to this table
+            c = ((pos[None, :] == a[:, None]) * w -
+                 (pos[None, :] == b[:, None]) * w)
+            share = np.einsum('ij,jk,ik->i', c, cov, c)
+            # the table's covariance shrinks like 1 / (a0 + 1)
+            less = share * games / (a0 + 1 + games)
+            after = _phi(diff / np.sqrt(np.maximum(var - less, 1e-300)))
+            gains.append(float((after - now).sum()))
+        return gains
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+# CMA-ES over the continuous parameters of a strategy, scored by simulation
+'''
+optimizer.py
+Tunes continuous strategy parameters by CMA-ES, treating the loss rate of
+a strategy against a fixed field of opponents (by default those of
+tourney.strategies) as a noisy objective:
+
+    opt = Optimizer(Weights, {'mult': Uniform(0.5, 3), 'eps': Uniform(0, 0.1),
+                              'weight': 'log'}, budget = 200000,
+                    log = 'weights.jsonl')
+    best = opt.run()
+
+Each generation proposes a batch of candidates, and every candidate of a
+generation plays the same seeded deals in the same seats (common random
+numbers), so their differences are not drowned by the luck of the cards.
+A batch is spread over a process pool or a distributed.Coordinator, and
+generations continue until the budget of games is spent.
+
+Parameters given as Uniform ranges are searched (integer ones are
+rounded); any other value is passed as it is. Every evaluation is appended
+to the JSON lines `log`. The search is seeded, so with resume it replays
+the logged evaluations instead of playing them and carries on from where
+the log ends.
+'''
+from __future__ import division
+import json
+import os
+import random
+from math import log, sqrt
+from multiprocessing import cpu_count
+from zlib import crc32
+import numpy as np
+
+from paramTuner import Uniform
+from resultSink import read
+from tourney import gamePool, gameSeed, playRanges
+
+class CMAES:
+    """Covariance matrix adaptation on [0, 1]^dim, minimizing.
+
+    >>> es = CMAES(2, seed = 0)
+    >>> for gen in range(60):
+    ...     xs = es.ask()
+    ...     es.tell(xs, [sum((x - 0.3) ** 2) for x in xs])
+    >>> [round(v, 2) for v in es.mean]
+    [0.3, 0.3]
+    """
+    def __init__(self, dim, popsize = None, sigma = 0.3, seed = 0):
+        self.dim = d = dim
+        self.popsize = popsize or 4 + int(3 * log(d))
+        self.mu = mu = self.popsize // 2
+        w = log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        self.weights = w / w.sum()
+        self.mueff = mueff = 1 / (self.weights ** 2).sum()
+        self.cc = (4 + mueff / d) / (d + 4 + 2 * mueff / d)
+        self.cs = (mueff + 2) / (d + mueff + 5)
+        self.c1 = 2 / ((d + 1.3) ** 2 + mueff)
+        self.cmu = min(1 - self.c1, 2 * (mueff - 2 + 1 / mueff) /
+                       ((d + 2) ** 2 + mueff))
+        self.damps = (1 + 2 * max(0, sqrt((mueff - 1) / (d + 1)) - 1) +
+                      self.cs)
+        self.chiN = sqrt(d) * (1 - 1 / (4 * d) + 1 / (21 * d * d))
+        self.mean = np.full(d, 0.5)
+        self.sigma = sigma
+        self.C = np.eye(d)
+        self.pc = np.zeros(d)
+        self.ps = np.zeros(d)
+        self.gen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def ask(self):
+        """A generation of candidates, reflected into the unit box."""
+        vals, B = np.linalg.eigh(self.C)
+        D = np.sqrt(np.maximum(vals, 1e-20))
+        z = self.rng.standard_normal((self.popsize, self.dim))
+        xs = self.mean + self.sigma * (z * D) @ B.T
+        # fold into [0, 1]: reflect off each wall
+        xs = np.abs(xs) % 2
+        return np.where(xs > 1, 2 - xs, xs)
+
+    def tell(self, xs, scores):
+        """Update from the scores of the candidates ask() returned."""
+        d, cs, cc = self.dim, self.cs, self.cc
+        best = np.asarray(xs)[np.argsort(scores, kind = 'stable')[:self.mu]]
+        old = self.mean
+        self.mean = self.weights @ best
+        step = (self.mean - old) / self.sigma
+        vals, B = np.linalg.eigh(self.C)
+        invsqrt = B @ np.diag(1 / np.sqrt(np.maximum(vals, 1e-20))) @ B.T
+        self.ps = ((1 - cs) * self.ps +
+                   sqrt(cs * (2 - cs) * self.mueff) * invsqrt @ step)
+        self.gen += 1
+        norm = np.linalg.norm(self.ps)
+        hsig = (norm / sqrt(1 - (1 - cs) ** (2 * self.gen)) / self.chiN <
+                1.4 + 2 / (d + 1))
+        self.pc = ((1 - cc) * self.pc +
+                   hsig * sqrt(cc * (2 - cc) * self.mueff) * step)
+        y = (best - old) / self.sigma
+        self.C = ((1 - self.c1 - self.cmu) * self.C +
+                  self.c1 * (np.outer(self.pc, self.pc) +
+                             (1 - hsig) * cc * (2 - cc) * self.C) +
+                  self.cmu * (y.T * self.weights) @ y)
+        self.sigma *= np.exp(cs / self.damps * (norm / self.chiN - 1))
+
+class Optimizer:
+    """CMA-ES over the Uniform parameters of space; factory(**params) builds
+    the strategy.
+
+    >>> from strategies.alexStrategies import FixFoldStrategy, RatioFoldStrategy
+    >>> opt = Optimizer(RatioFoldStrategy, {'N': Uniform(10, 60)},
+    ...                 {'Fix': FixFoldStrategy(3)}, budget = 600,
+    ...                 gamesPerEval = 50, workers = 1, seed = 'doc',
+    ...                 verbose = False)
+    >>> best = opt.run()
+    >>> opt.played <= 600, 10 <= best['N'] <= 60
+    (True, True)
+    """
+    def __init__(self, factory, space, opponents = None, budget = 100000,
+                 gamesPerEval = 500, popsize = None, sigma = 0.3,
+                 workers = cpu_count(), seed = None, log = None,
+                 resume = False, cluster = None, verbose = True):
+        if opponents is None:
+            from tourney import strategies as opponents
+        self.factory = factory
+        self.space = space
+        self.names = [n for n in space if isinstance(space[n], Uniform)]
+        if not self.names:
+            raise ValueError("The space has no Uniform parameters to search.")
+        self.opponents = dict(opponents)
+        for key, value in self.opponents.items():
+            value.tourney_key = key
+        self.budget = budget
+        self.gamesPerEval = gamesPerEval
+        self.workers = workers
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.cluster = cluster
+        self.verbose = verbose
+        self.played = 0
+        # logged evaluations, by generation and candidate
+        self.log = log
+        self._logged = {}
+        header = {'factory': factory.__name__,
+                  'space': {n: repr(v) for n, v in space.items()},
+                  'opponents': list(self.opponents),
+                  'gamesPerEval': gamesPerEval, 'popsize': popsize,
+                  'sigma': sigma}
+        if log and resume and os.path.exists(log):
+            self._load(header)
+        elif log:
+            with open(log, 'w') as f:
+                f.write(json.dumps(dict(header, seed = self.seed)) + '\n')
+        self.es = CMAES(len(self.names), popsize, sigma,
+                        crc32(str(self.seed).encode()))
+
+    def params(self, x):
+        """The constructor arguments of a point of the unit box."""
+        params = dict(self.space)
+        for name, v in zip(self.names, x):
+            u = self.space[name]
+            value = u.lo + float(v) * (u.hi - u.lo)
+            params[name] = int(round(value)) if u.integer else value
+        return params
+
+    def run(self):
+        """Spend the budget and return the parameters at the mean of the
+        search distribution."""
+        cost = self.es.popsize * self.gamesPerEval
+        with gamePool(self.workers, self.cluster) as pool:
+            while self.played + cost <= self.budget:
+                xs = self.es.ask()
+                rates = self._evaluate(pool, xs)
+                self.es.tell(xs, rates)
+                self.played += cost
+                if self.verbose:
+                    print('Generation %d: %d games, best %.1f%%, sigma %.3f' %
+                          (self.es.gen, self.played, 100 * min(rates),
+                           self.es.sigma))
+        return self.params(self.es.mean)
+
+    def _evaluate(self, pool, xs):
+        """Loss rates of a generation's candidates, all on the same deals,
+        from the log where it has them."""
+        gen = self.es.gen
+        seed = gameSeed(self.seed, gen)
+        rates, ranges, owners = [None] * len(xs), [], []
+        n = self.gamesPerEval
+        for i, x in enumerate(xs):
+            if (gen, i) in self._logged:
+                rates[i] = self._logged[(gen, i)]
+                continue
+            strats = dict(self.opponents)
+            strats['candidate'] = self.factory(**self.params(x))
+            strats['candidate'].tourney_key = 'candidate'
+            ranges.append((strats, seed, 0, n))
+            owners.append(i)
+        played = playRanges(pool, ranges, self.workers)
+        for i, (losers, stats) in zip(owners, played):
+            lost = losers.count('candidate')
+            rates[i] = lost / n
+            self._append({'gen': gen, 'i': i, 'params': self.params(xs[i]),
+                          'lost': lost, 'games': n})
+        return rates
+
+    def _append(self, record):
+        if self.log:
+            with open(self.log, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def _load(self, header):
+        # a last line cut short by a crash is dropped and played again
+        records = list(read(self.log))
+        first = dict(records[0]) if records else {}
+        self.seed = first.pop('seed', None)
+        if first != header:
+            raise ValueError("The log %s is of a different search." %
+                             self.log)
+        for r in records[1:]:
+            self._logged[(r['gen'], r['i'])] = r['lost'] / r['games']
+        with open(self.log, 'w') as f:
+            f.write(''.join(json.dumps(r) + '\n' for r in records))
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ['test']:
+        import doctest
+        doctest.testmod()
+    else:
+        from tourney import strategies
+        from strategies.chrisStrategies import Weights
+        field = {k: strategies[k] for k in ('Dave', 'Brian', 'Danni')}
+        opt = Optimizer(Weights, {'mult': Uniform(0.5, 3),
+                                  'eps': Uniform(0, 0.1),
+                                  'exp': Uniform(0.1, 1), 'weight': 'exp'},
+                        field, budget = 200000, seed = 'optimizer',
+                        log = 'optimizer_log.jsonl', resume = True)
+        print(opt.run())
@@ -1,6 +1,95 @@
 # -*- coding: utf-8 -*-
 # Classes used by the tournament program to run computer continuous Pairs
 
+import logging
+import queue
+import random
+import threading
+import time
+from functools import cached_property
+from gameEvents import (EVENTS, GameEvent, DecisionEvent, HitEvent,
+                        FoldEvent, RedealEvent, ReshuffleEvent, TurnEvent,
+                        EndEvent, VerbosePrinter)
+from pairs_math import hitEV
+
+# idle persistent threads that run Strategy.play when a Dealer has a time
+# limit; a thread still busy with an overrunning decision is not among them
+_idleDeciders = []
+_idleLock = threading.Lock()
+_deciders = [0] # how many there are, idle or busy
+
+class _Decision:
+    """One call of Strategy.play on a decider thread: when it started, the
+    CPU time it has used, and its reply or the exception it raised."""
+    def __init__(self, play, info):
+        self.play = play
+        self.info = info
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.start = None
+        self.clock = None
+        self.cpuStart = None
+        self.cpuEnd = None
+        self.busy = 0
+        self.reply = None
+        self.error = None
+
+    def cpu(self):
+        """Seconds of CPU time the decision's own thread has used, or None
+        where threads have no CPU clock of their own. Once it is done, that
+        is what the decision used."""
+        if self.clock is None:
+            return None
+        if self.cpuEnd is not None:
+            return self.cpuEnd - self.cpuStart
+        return time.clock_gettime(self.clock) - self.cpuStart
+
+class _Decider(threading.Thread):
+    """A thread that runs decisions one at a time, going back among the
+    idle ones after each."""
+    def __init__(self):
+        threading.Thread.__init__(self, daemon = True)
+        self.tasks = queue.SimpleQueue()
+        self.start()
+
+    def run(self):
+        clock = None
+        if hasattr(time, 'pthread_getcpuclockid'):
+            clock = time.pthread_getcpuclockid(threading.get_ident())
+        while True:
+            decision = self.tasks.get()
+            decision.start = time.perf_counter()
+            if clock is not None:
+                decision.clock = clock
+                decision.cpuStart = time.clock_gettime(clock)
+            decision.started.set()
+            try:
+                decision.reply = decision.play(decision.info)
+            except BaseException as e:
+                decision.error = e
+            if clock is not None:
+                decision.cpuEnd = time.clock_gettime(clock)
+            decision.done.set()
+            with _idleLock:
+                _idleDeciders.append(self)
+
+def _decide(play, info):
+    """Start play(info) on an idle decider, or a new one if all are busy,
+    and return its _Decision once it has started. Its busy attribute is the
+    number of other deciders still running overrunning decisions."""
+    with _idleLock:
+        decider = _idleDeciders.pop() if _idleDeciders else None
+        if decider is None:
+            _deciders[0] += 1
+        busy = _deciders[0] - len(_idleDeciders) - 1
+    if decider is None:
+        decider = _Decider()
+    decision = _Decision(play, info)
+    decision.busy = busy
+    decider.tasks.put(decision)
+    decision.started.wait()
+    return decision
+
 class Dealer:
     """This asks Strategy classes to play the game and tracks the game state.
 
@@ -10,29 +99,103 @@ class Dealer:
     >>> d.gameState.deck
     [1, 2, 2, 3, 3, 3, 4, 4, 4, 4, 5, 5, 5, 5, 5, 6, 6, 6, 6, 6, 6, 7, 7, 7, 7, 7, 7, 7, 8, 8, 8, 8, 8, 8, 8, 8, 9, 9, 9, 9, 9, 9, 9, 9, 9, 10, 10, 10, 10, 10, 10, 10, 10, 10, 10]
 
+    >>> Dealer(countDeck = True).gameState.deck == d.gameState.deck
+    True
+
+    A seeded Dealer deals the same game every time:
+
+    >>> Dealer(seed = '7-0').play() == Dealer(seed = '7-0').play()
+    True
+
     """
 
-    def __init__(self, noPlayers = 5, standard = False, calamity = False, verbose = False):
+    def __init__(self, noPlayers = 5, standard = False, calamity = False, verbose = False,
+                 countDeck = False, seed = None, recorder = None,
+                 timeLimit = None, onTimeout = 'hit', stats = None):
 
-        self.gameState = Information()
+        # the game's own random stream; strategies only see snapshots, which
+        # do not carry it
+        self.rng = random.Random(seed)
+        if countDeck:
+            self.gameState = CountInformation(self.rng)
+        else:
+            self.gameState = Information(self.rng)
         self.gameState.noPlayers = noPlayers
+        # observers' methods for each event in gameEvents.EVENTS
+        self._handlers = dict([(name, []) for name in EVENTS])
+        self._printer = None
         self.verbose = verbose
         self.standard = standard
         self.calamity = calamity
+        self.recorder = recorder # e.g. a gameTrace.TraceRecorder
+        self.stats = stats # e.g. a gameStats.GameStats
+        for observer in (recorder, stats):
+            if observer:
+                self.subscribe(observer)
+        # ms per decision; a Strategy over it is forced to hit or, with
+        # onTimeout = 'disqualify', loses the game
+        self._timeLimit = timeLimit
+        self.onTimeout = onTimeout
+        self.overruns = []
+        self.disqualified = None
+        # CPU seconds of the last decision run on a decider thread
+        self._decisionCpu = None
         for n in range(self.gameState.noPlayers):
             self.gameState.players.append(Player(n))
 
         for i in range(1, 11):
             self.gameState.deck += [i] * i
 
+    @property
+    def verbose(self):
+        return self._printer is not None
+
+    @verbose.setter
+    def verbose(self, verbose):
+        if verbose and self._printer is None:
+            self._printer = VerbosePrinter()
+            self.subscribe(self._printer)
+        elif not verbose and self._printer is not None:
+            self.unsubscribe(self._printer)
+            self._printer = None
+
+    def subscribe(self, observer):
+        """Call observer's method for each event of gameEvents.EVENTS that
+        it has, e.g. observer.on_pair(HitEvent(...)) when a card pairs.
+
+        >>> class Pairs:
+        ...     def __init__(self):
+        ...         self.cards = []
+        ...     def on_pair(self, e):
+        ...         self.cards.append(e.card)
+        >>> d = Dealer(3, seed = 1)
+        >>> pairs = Pairs()
+        >>> d.subscribe(pairs)
+        >>> loser = d.play()
+        >>> sum(pairs.cards) <= sum([p.getScore() for p in d.gameState.players])
+        True
+        """
+        for name in EVENTS:
+            method = getattr(observer, name, None)
+            if method is not None:
+                self._handlers[name].append(method)
+
+    def unsubscribe(self, observer):
+        for name in EVENTS:
+            method = getattr(observer, name, None)
+            if method is not None and method in self._handlers[name]:
+                self._handlers[name].remove(method)
+
     def deal(self):
         for player in self.gameState.players:
             player.strategy.player = player
 
         self.gameState.startIndex = self.redeal()
 
-        for i, player in enumerate(self.gameState.players):
-            self.vPrint('Player ' + str(i) + '\'s stack: ' + str(player.stack))
+        if self._handlers['on_game']:
+            _emit(self._handlers['on_game'],
+                  GameEvent(self.gameState.players,
+                            self.gameState.startIndex))
 
     def redeal(self):
         '''Deal a new card to all players and determine first player. The discard list is not updated.'''
@@ -51,7 +214,7 @@ class Dealer:
                 else:
                     player.hit(self.gameState.draw())
                     while player.whichPair():
-                        self.gameState.discards.append(player.stack.pop(-1))
+                        self.gameState.discard(player.pop())
                         player.hit(self.gameState.draw())
                     if len(player.stack) >= 5:
                         self.redeal()
@@ -64,143 +227,331 @@ class Dealer:
     def sumC(self, stack):
         return sum(stack) - 7 * self.calamity * (7 in stack)
 
-    def vPrint_stacks(self):
-        for p in self.gameState.players:
-            self.vPrint('Player ' + str(p._index) + ' stack:')
-            self.vPrint(p.stack)
-
     def play(self):
-        from copy import deepcopy
         self.deal() # should be called by Tournament?
-        highestScore = max(int(60 / self.gameState.noPlayers) + 1, 11)
-
-        allScores = [player.getScore() for player in self.gameState.players]
-        currentIndex = self.gameState.startIndex
-
-        while max(allScores) < highestScore:
+        state = self.gameState
+        players = state.players
+        highestScore = max(int(60 / state.noPlayers) + 1, 11)
+
+        # only the player on turn can score, so the top score is kept running
+        topScore = 0
+        currentIndex = state.startIndex
+        # events are only built, and phases only timed, for observers
+        handlers = self._handlers
+        on_decision = handlers['on_decision']
+        on_hit, on_pair = handlers['on_hit'], handlers['on_pair']
+        on_fold, on_redeal = handlers['on_fold'], handlers['on_redeal']
+        on_reshuffle, on_turn = handlers['on_reshuffle'], handlers['on_turn']
+        on_draw = on_hit or on_pair
+        reshuffles = state.reshuffles
+        clock, cpuClock = time.perf_counter, time.thread_time
+
+        while topScore < highestScore:
             cal = False
-            currentPlayer = self.gameState.players[currentIndex]
-            pre_pts = currentPlayer.getScore()
-            info = deepcopy(self.gameState)
-            inStacks = self.gameState.inStacks()
-            if inStacks == [] or \
+            seat = currentIndex
+            currentPlayer = players[currentIndex]
+            pre_pts = currentPlayer._score
+            hitCard = 0
+            foldFrom = (-1, 0)
+            folded = False
+            lowest = min([p._min for p in players])
+            forced = lowest == 11 or \
              len(currentPlayer.stack) == 0 or \
-             (min(inStacks) + currentPlayer.getScore()) >= highestScore:
+             (lowest + pre_pts) >= highestScore
+            if forced:
                 reply = 'hit.'
-                self.vPrint('Player '+str(currentIndex)+' was forced to hit.')
             else:
-                reply = currentPlayer.strategy.play(info)
-                self.vPrint('Player '+str(currentIndex)+' replied '+str(reply))
+                if on_decision:
+                    cpu, wall = cpuClock(), clock()
+                reply = self.turn(currentPlayer.strategy)
+                if on_decision:
+                    wall = clock() - wall
+                    if self._timeLimit is None:
+                        cpu = cpuClock() - cpu
+                    else:
+                        # it ran on a decider thread; without a CPU clock
+                        # for that thread, count its wall time
+                        cpu = self._decisionCpu
+                        if cpu is None:
+                            cpu = wall
+                    _emit(on_decision,
+                          DecisionEvent(seat, currentPlayer.strategy, reply,
+                                        cpu, wall))
+                if self.disqualified is not None:
+                    return self._end(self.disqualified)
 
             if reply == 'fold':
-                foldFrom = self.gameState.bestFold(currentPlayer)
-                self.gameState.players[foldFrom[0]].steal(foldFrom[1])
+                foldFrom = state.bestFold(currentPlayer)
+                players[foldFrom[0]].steal(foldFrom[1])
                 currentPlayer.catch(foldFrom[1])
-                self.vPrint('You just folded for ' + str(foldFrom[1]) +
-                    ' Your stack: ' + str(currentPlayer.stack) +
-                    ' Your score: ' + str(currentPlayer.getScore()))
+                folded = True
             else:
                 try:
-                    self.gameState.players[reply[0]].steal(reply[1])
+                    players[reply[0]].steal(reply[1])
                     currentPlayer.catch(reply[1])
-                    self.vPrint('You just folded for ' + str(reply[1]) +
-                           ' Your stack: ' +
-                           str(currentPlayer.stack) +
-                            ' Your score: ' +
-                            str(currentPlayer.getScore()))
+                    foldFrom = reply
+                    folded = True
                 except(TypeError, KeyError):
-                    self.vPrint('No valid fold option given.')
-                    hitCard = self.gameState.draw()
+                    if on_draw:
+                        wall = clock()
+                    hitCard = state.draw()
+                    if on_draw:
+                        wall = clock() - wall
                     currentPlayer.hit(hitCard)
-                    whichPair = currentPlayer.whichPair()
-                    if whichPair:
+                    if currentPlayer.whichPair():
                         currentPlayer.catch(hitCard)
-                        self.vPrint('You just paired for ' + str(hitCard) +
-                               ' Your stack: ' +
-                               str(currentPlayer.stack) +
-                                ' Your score: ' +
-                                str(currentPlayer.getScore()))
+                        if on_pair:
+                            _emit(on_pair, HitEvent(seat, hitCard, forced,
+                                  tuple(currentPlayer._stack),
+                                  currentPlayer._score, wall))
                     else:
-                        self.vPrint('You just hit for ' + str(hitCard) +
-                               ' Your stack: ' +
-                               str(currentPlayer.stack) +
-                                ' Your score: ' +
-                                str(currentPlayer.getScore()))
+                        if on_hit:
+                            _emit(on_hit, HitEvent(seat, hitCard, forced,
+                                  tuple(currentPlayer._stack),
+                                  currentPlayer._score, wall))
                         if hitCard == 7:
                             cal = True
-            
-            post_pts = currentPlayer.getScore()
+            if folded and on_fold:
+                _emit(on_fold, FoldEvent(seat, foldFrom[0], foldFrom[1],
+                                         tuple(currentPlayer._stack),
+                                         currentPlayer._score))
+
+            post_pts = currentPlayer._score
             if pre_pts < post_pts < highestScore and self.standard:
-                self.vPrint('Standard: Points earned, dealing new cards to all players. Pre stacks:')
-                self.vPrint_stacks()
+                if on_redeal:
+                    before = [tuple(p._stack) for p in players]
+                    wall = clock()
                 first = self.redeal()
-                self.vPrint('Post stacks:')
-                self.vPrint_stacks()
-                self.vPrint('Player ' + str(first) + ' now goes first.')
+                if on_redeal:
+                    _emit(on_redeal, RedealEvent(before,
+                          [tuple(p._stack) for p in players], first,
+                          clock() - wall))
                 currentIndex = first - 1
+            if on_reshuffle and state.reshuffles != reshuffles:
+                for n in range(reshuffles, state.reshuffles):
+                    _emit(on_reshuffle, ReshuffleEvent(n + 1))
+                reshuffles = state.reshuffles
+            if on_turn:
+                # every turn has one, so the loop of _emit is inlined
+                event = TurnEvent(seat, forced, hitCard, tuple(foldFrom),
+                                  pre_pts, post_pts)
+                for handler in on_turn:
+                    handler(event)
 
             if self.calamity and cal:
                 currentIndex -= 1
-            allScores = [player.getScore() for player in self.gameState.players]
-            currentIndex = (currentIndex + 1) % self.gameState.noPlayers
-
-        return (currentIndex - 1) % self.gameState.noPlayers
+            topScore = max(topScore, post_pts)
+            currentIndex = (currentIndex + 1) % state.noPlayers
+
+        return self._end((currentIndex - 1) % state.noPlayers)
+
+    def _end(self, loser):
+        if self._handlers['on_end']:
+            _emit(self._handlers['on_end'], EndEvent(loser,
+                  [p._score for p in self.gameState.players]))
+        return loser
+
+    def timeLimit(self):
+        """The time limit for a Strategy to decide on its move, in ms, or None."""
+        return self._timeLimit
+
+    def turn(self, strategy):
+        """Ask the strategy for its move on a snapshot of the game state.
+
+        With a time limit the decision runs on a persistent pool of threads.
+        A strategy that overruns is logged and forced to hit, or
+        disqualified. Python cannot stop a thread, so an overrunning
+        decision finishes in the background and its reply is ignored; its
+        thread rejoins the pool then, and until it does the pool starts
+        another, so later decisions never wait behind it.
+
+        A decision is charged the CPU time of its own thread, so one left
+        running by an overrun, which shares the interpreter with it, does
+        not use up its budget. A decision that blocks instead (or any, where
+        threads have no CPU clock) overruns on the wall clock, with the
+        limit stretched by one for each overrun still running.
+
+        >>> import time
+        >>> class Slow:
+        ...     def play(self, info):
+        ...         time.sleep(0.2)
+        ...         return 'fold'
+        >>> d = Dealer(2, timeLimit = 20)
+        >>> d.gameState.players[0].strategy = Slow()
+        >>> d.deal()
+        >>> d.turn(d.gameState.players[0].strategy)
+        'hit.'
+        >>> len(d.overruns)
+        1
+
+        Overruns that keep computing do not hold up fast strategies:
+
+        >>> class Spin:
+        ...     def play(self, info):
+        ...         end = time.perf_counter() + 0.3
+        ...         while time.perf_counter() < end:
+        ...             pass
+        ...         return 'fold'
+        >>> class Fast:
+        ...     def play(self, info):
+        ...         n = 0
+        ...         for i in range(100000):
+        ...             n += i
+        ...         return 'hit'
+        >>> d = Dealer(2, timeLimit = 50)
+        >>> d.gameState.players[0].strategy = Spin()
+        >>> d.gameState.players[1].strategy = Fast()
+        >>> d.deal()
+        >>> [d.turn(d.gameState.players[0].strategy) for i in range(4)]
+        ['hit.', 'hit.', 'hit.', 'hit.']
+        >>> [d.turn(d.gameState.players[1].strategy) for i in range(10)]
+        ['hit', 'hit', 'hit', 'hit', 'hit', 'hit', 'hit', 'hit', 'hit', 'hit']
+        >>> len(d.overruns)
+        4
+        """
+        info = self.gameState.snapshot()
+        if self._timeLimit is None:
+            return strategy.play(info)
+        decision = _decide(strategy.play, info)
+        limit = self._timeLimit / 1000
+        wall = limit * (1 + decision.busy)
+        while True:
+            left = wall - (time.perf_counter() - decision.start)
+            # look at the CPU clock a few times within the limit
+            if decision.done.wait(min(max(left, 0), limit / 4)):
+                self._decisionCpu = decision.cpu()
+                if decision.error is not None:
+                    raise decision.error
+                return decision.reply
+            cpu = self._decisionCpu = decision.cpu()
+            if left <= 0 or (cpu is not None and cpu > limit):
+                break
+        index = strategy.player._index
+        name = getattr(strategy, 'tourney_key', type(strategy).__name__)
+        self.overruns.append((index, name))
+        logging.getLogger(__name__).warning(
+            'Player %d (%s) overran the %s ms time limit.',
+            index, name, self._timeLimit)
+        if self.onTimeout == 'disqualify':
+            self.disqualified = index
+        return 'hit.'
 
     def vPrint(self, args):
         if self.verbose:
             print(args)
 
+def _emit(handlers, event):
+    for handler in handlers:
+        handler(event)
+
 class Information:
     """This the the game state information provided to Strategy classes to make
     decisions with.
     """
-    def __init__(self):
+    __slots__ = ('_cards', '_ranks', 'discards', 'players', 'burn',
+                 'startIndex', 'noPlayers', 'allPoints', 'allStacks',
+                 '_shared', '_rng', 'reshuffles')
+
+    def __init__(self, rng = None):
         self.deck = []
         self.discards = []
         self.players = []
         self.burn = 5
         self.startIndex = 0 # Dealer.deal will set this properly
         self.noPlayers = 0 # Dealer.__init__ will set this properly
+        self._shared = False # True while a snapshot refers to discards
+        self._rng = random.Random() if rng is None else rng
+        self.reshuffles = 0
+
+    @property
+    def deck(self):
+        return self._cards
+
+    @deck.setter
+    def deck(self, deck):
+        # the count of each rank, kept up to date by draw, is what a
+        # snapshot takes of the deck
+        self._cards = deck
+        self._ranks = [0] * 10
+        for card in deck:
+            self._ranks[card - 1] += 1
 
     def bestFolds(self):
         """
         Gets a list of tuples with the player index and smallest card for each player.
         """
-        best = []
-        for i in range(len(self.players)):
-            low = 10
-            for card in self.players[i].stack:
-                if low>card:
-                    low = card
-            best += [(i, low)]
-        return best
+        return [(i, min(p._min, 10)) for i, p in enumerate(self.players)]
 
     def bestFold(self, player):
         """
         Return the "best" fold, for a nondiscriminating sort of strategy.
         """
-        best = min([fold[1] for fold in self.bestFolds()])
+        best = min([min(p._min, 10) for p in self.players])
         index = (player.index()-1)%self.noPlayers # player to right
         while True:
-            if min([11]+self.players[index].stack) == best:
+            if self.players[index]._min == best:
                 return (index, best)
             else:
                 index = (index - 1)%self.noPlayers
 
+    @property
+    def context(self):
+        """
+        A TurnContext of statistics derived from the current state. A
+        snapshot keeps its context for the turn; here it is rebuilt on every
+        access, since the state keeps changing.
+        """
+        return TurnContext(self)
+
+    def deckCounts(self):
+        """
+        Return a list with the number of each rank (1 to 10) left in the deck.
+        """
+        counts = [0] * 10
+        for card in self.deck:
+            counts[card - 1] += 1
+        return counts
+
+    def snapshot(self):
+        """
+        Return a read-only InformationView of the current state. The view
+        takes the count of each rank in the deck, and shares the discards
+        until either side changes them.
+        """
+        self._shared = True
+        return InformationView(self)
+
+    def _frozenCounts(self):
+        return tuple(self._ranks)
+
+    def discard(self, card):
+        self._own()
+        self.discards.append(card)
+
+    def _own(self):
+        """Copy the discards if a snapshot still refers to them."""
+        if self._shared:
+            self.discards = list(self.discards)
+            self._shared = False
 
     def draw(self):
-        from random import choice
-        if len(self.deck) <= self.burn: # time to shuffle
-            self.deck = []
-            for i in range(1, 11):
-                self.deck += [i] * i
-            for i in self.inPoints() + self.inStacks():
-                self.deck.remove(i)
-            self.discards = []
-        card = choice(self.deck)
-        self.deck.remove(card)
+        if len(self._cards) <= self.burn: # time to shuffle
+            self._reshuffle()
+        card = self._rng.choice(self._cards)
+        self._cards.remove(card)
+        self._ranks[card - 1] -= 1
         return card
 
+    def _reshuffle(self):
+        deck = []
+        for i in range(1, 11):
+            deck += [i] * i
+        for i in self.inPoints() + self.inStacks():
+            deck.remove(i)
+        self.deck = deck
+        self.discards = []
+        self.reshuffles += 1
+
     def inPoints(self):
         self.allPoints = []
         for player in self.players:
@@ -213,21 +564,301 @@ class Information:
             self.allStacks += player.stack
         return self.allStacks
 
+class InformationView(Information):
+    """A snapshot of Information handed to a Strategy on its turn.
+
+    Stacks and points are frozen into tuples and the deck into the count of
+    each rank. The deck is only expanded into a private list, and the
+    discards copied, the first time the Strategy reads them, so a Strategy
+    may change its view (even draw from it) without touching the game
+    state. Drawing from a view uses the global random module rather
+    than the game's own stream, so it reveals nothing about the next card.
+
+    >>> d = Dealer(3)
+    >>> d.deal()
+    >>> info = d.gameState.snapshot()
+    >>> info.deck.remove(10)
+    >>> len(info.deck) == len(d.gameState.deck) - 1
+    True
+    >>> info.players[0].stack == tuple(d.gameState.players[0].stack)
+    True
+    >>> info.players[0].hit(5)
+    Traceback (most recent call last):
+    ...
+    AttributeError: 'tuple' object has no attribute 'append'
+    """
+    __slots__ = ('_counts', '_deck', '_discards', '_deckOwned',
+                 '_discardsOwned', '_context')
+
+    def __init__(self, master):
+        self._counts = master._frozenCounts()
+        self._deck = None
+        self._discards = master.discards
+        self._deckOwned = False
+        self._discardsOwned = False
+        self.players = [PlayerView(p) for p in master.players]
+        self.burn = master.burn
+        self.startIndex = master.startIndex
+        self.noPlayers = master.noPlayers
+        self.reshuffles = master.reshuffles
+        self._shared = False
+        self._rng = random
+        self._context = None
+
+    @property
+    def context(self):
+        if self._context is None:
+            self._context = TurnContext(self)
+        return self._context
+
+    @property
+    def deck(self):
+        if not self._deckOwned:
+            self._deck = _expand(self._counts)
+            self._deckOwned = True
+        return self._deck
+
+    @deck.setter
+    def deck(self, deck):
+        self._deck = deck
+        self._deckOwned = True
+        self._counts = None
+
+    def deckCounts(self):
+        if self._deckOwned:
+            return Information.deckCounts(self)
+        return list(self._counts)
+
+    @property
+    def discards(self):
+        if not self._discardsOwned:
+            self._discards = list(self._discards)
+            self._discardsOwned = True
+        return self._discards
+
+    @discards.setter
+    def discards(self, discards):
+        self._discards = discards
+        self._discardsOwned = True
+
+    def snapshot(self):
+        return InformationView(self)
+
+    def _frozenCounts(self):
+        return tuple(self.deckCounts())
+
+    def draw(self):
+        if len(self.deck) <= self.burn: # time to shuffle
+            self._reshuffle()
+        card = self._rng.choice(self.deck)
+        self.deck.remove(card)
+        return card
+
+    def _own(self):
+        pass
+
+class CountInformation(Information):
+    """Information whose deck is held as a count of each rank.
+
+    Drawing is a weighted choice over the ten ranks and reshuffling is
+    arithmetic on the counts. `deck` is still available as a sorted list,
+    which is only rebuilt when it is read after the counts have changed.
+
+    >>> info = CountInformation()
+    >>> info.deck = [1, 2, 2, 10]
+    >>> info.deckCounts()
+    [1, 2, 0, 0, 0, 0, 0, 0, 0, 1]
+    >>> info.burn = 0
+    >>> info.draw() in (1, 2, 10)
+    True
+    >>> len(info.deck)
+    3
+    """
+    __slots__ = ('counts', '_size', '_deckList')
+
+    def __init__(self, rng = None):
+        Information.__init__(self, rng)
+        self.counts = [0] * 10
+        self._size = 0
+        self._deckList = []
+
+    @property
+    def deck(self):
+        if self._deckList is None:
+            self._deckList = _expand(self.counts)
+        return self._deckList
+
+    @deck.setter
+    def deck(self, deck):
+        self.counts = [0] * 10
+        for card in deck:
+            self.counts[card - 1] += 1
+        self._size = len(deck)
+        self._deckList = None
+
+    def deckCounts(self):
+        return list(self.counts)
+
+    def draw(self):
+        if self._size <= self.burn: # time to shuffle
+            self.counts = list(range(1, 11))
+            for i in self.inPoints() + self.inStacks():
+                self.counts[i - 1] -= 1
+            self._size = sum(self.counts)
+            self.discards = []
+            self.reshuffles += 1
+        x = int(self._rng.random() * self._size)
+        for i, count in enumerate(self.counts):
+            x -= count
+            if x < 0:
+                break
+        self.counts[i] -= 1
+        self._size -= 1
+        self._deckList = None
+        return i + 1
+
+    def _frozenCounts(self):
+        return tuple(self.counts)
+
+def _expand(counts):
+    deck = []
+    for i, count in enumerate(counts):
+        deck += [i + 1] * count
+    return deck
+
+class TurnContext:
+    """Statistics that strategies derive from the game state on their turn,
+    each computed the first time it is asked for and then kept. A Strategy
+    gets one as `info.context`, which describes the state as it was dealt:
+    changes a Strategy makes to its own view do not show up in it.
+
+    Ranks index `counts` and `probs` directly, so `counts[7]` is the number
+    of sevens left in the deck and `counts[0]` is always 0.
+
+    >>> d = Dealer(3)
+    >>> d.deal()
+    >>> ctx = d.gameState.snapshot().context
+    >>> ctx.deckSize == len(d.gameState.deck) == sum(ctx.counts)
+    True
+    >>> ctx.target, ctx.scores
+    (21, [0, 0, 0])
+    >>> ctx.bestFold(0) == d.gameState.bestFold(d.gameState.players[0])
+    True
+    >>> abs(sum(ctx.probs) - 1) < 1e-12
+    True
+    """
+    def __init__(self, info):
+        self.info = info
+        self.noPlayers = info.noPlayers
+        self.target = max(int(60 / info.noPlayers) + 1, 11)
+        self._bestFold = {}
+        self._evHit = {}
+
+    @cached_property
+    def counts(self):
+        return (0,) + tuple(self.info.deckCounts())
+
+    @cached_property
+    def deckSize(self):
+        return sum(self.counts)
+
+    @cached_property
+    def probs(self):
+        """The probability of drawing each rank next, before a reshuffle."""
+        size = self.deckSize
+        return tuple([n / size for n in self.counts])
+
+    @cached_property
+    def scores(self):
+        return [p._score for p in self.info.players]
+
+    @cached_property
+    def stackSums(self):
+        return [sum(p._stack) for p in self.info.players]
+
+    @cached_property
+    def bestFolds(self):
+        return self.info.bestFolds()
+
+    def bestFold(self, index):
+        """Like Information.bestFold, for the player with this index."""
+        if index not in self._bestFold:
+            self._bestFold[index] = self.info.bestFold(self.info.players[index])
+        return self._bestFold[index]
+
+    def evHit(self, index):
+        """The expected points the player with this index pairs for with
+        the next card."""
+        if index not in self._evHit:
+            stack = tuple(self.info.players[index]._stack)
+            self._evHit[index] = hitEV(self.counts, stack)
+        return self._evHit[index]
+
 class Player:
     """This holds information about the cards that a player has.
+
+    The score, the number of each rank in the stack, the smallest card and
+    any pair are kept up to date by catch, hit, steal and pop, so the stack
+    should only be changed through those methods (or by assigning a new
+    list to `stack`).
+
+    >>> p = Player(0)
+    >>> p.hit(4); p.hit(9); p.hit(4)
+    >>> p.whichPair(), p.getSmallest()
+    (4, 4)
+    >>> p.steal(4)
+    >>> p.whichPair(), p.getSmallest()
+    (False, 4)
+    >>> p.hit(7); p.hit(9)
+    >>> p.pop(), p.whichPair(), p.stack
+    (9, False, [9, 4, 7])
+    >>> p.catch(9)
+    >>> p.getScore(), p.stack
+    (9, [])
     """
+    __slots__ = ('_stack', 'points', 'strategy', '_index', '_score',
+                 '_counts', '_min', '_pair')
+
     def __init__(self, index):
         self.stack = []
         self.points = []
+        self._score = 0
         self.strategy = SimpletonStrategy()
         self._index = index
 
+    @property
+    def stack(self):
+        return self._stack
+
+    @stack.setter
+    def stack(self, stack):
+        self._stack = stack
+        self._counts = [0] * 11
+        self._min = 11
+        self._pair = False
+        for card in stack:
+            self._counts[card] += 1
+            if self._counts[card] > 1:
+                self._pair = card
+            if card < self._min:
+                self._min = card
+
     def catch(self, card):
-        self.stack = []
+        for c in self._stack:
+            self._counts[c] = 0
+        self._stack = []
+        self._min = 11
+        self._pair = False
         self.points.append(card)
+        self._score += card
 
     def hit(self, card):
-        self.stack.append(card)
+        self._stack.append(card)
+        self._counts[card] += 1
+        if self._counts[card] > 1 and not self._pair:
+            self._pair = card
+        if card < self._min:
+            self._min = card
 
     def index(self, newIndex=None):
         if newIndex == None:
@@ -235,26 +866,51 @@ class Player:
         self._index = newIndex
 
     def getScore(self):
-        return sum(self.points)
+        return self._score
 
     def getSmallest(self):
-        return min(self.stack)
+        if not self._stack:
+            raise ValueError('empty stack')
+        return self._min
 
     def steal(self, card):
-        if card in self.stack:
-            self.stack.remove(card)
+        if card in self._stack:
+            self._stack.remove(card)
         else:
             raise KeyError
+        self._forget(card)
+
+    def pop(self):
+        '''Remove and return the last card of the stack.'''
+        card = self._stack.pop()
+        self._forget(card)
+        return card
+
+    def _forget(self, card):
+        self._counts[card] -= 1
+        if card == self._pair and self._counts[card] < 2:
+            self._pair = False
+            for c in self._stack:
+                if self._counts[c] > 1:
+                    self._pair = c
+                    break
+        if card == self._min and not self._counts[card]:
+            self._min = min(self._stack) if self._stack else 11
 
     def whichPair(self):
-        if self.stack == []:
-            return False
-        from collections import Counter
-        mostCommon = Counter(self.stack).most_common(1)[0]
-        if mostCommon[1] > 1:
-            return mostCommon[0]
-        else:
-            return False
+        return self._pair
+
+class PlayerView(Player):
+    """A frozen copy of a Player's stack and points for an InformationView."""
+    __slots__ = ()
+
+    def __init__(self, player):
+        self._stack = tuple(player._stack)
+        self.points = tuple(player.points)
+        self._index = player._index
+        self._score = player._score
+        self._min = player._min
+        self._pair = player._pair
 
 class SimpletonStrategy:
     """This is an example strategy"""
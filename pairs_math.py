@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# Probability kernels for the decision math of Pairs strategies
+'''
+pairs_math.py
+Closed-form probabilities over rank-count vectors, for strategies to use
+instead of scanning the deck list with deck.count.
+
+A count vector is a tuple of 11 integers indexed by rank, so `counts[7]` is
+the number of sevens and `counts[0]` is always 0; TurnContext.counts is
+one. Stacks are tuples of cards. Every kernel is a pure function of its
+arguments and is cached, so the same question asked by several strategies,
+or several times by one, on the same turn is answered once.
+
+The vectors are only ten ranks long, so the kernels are plain Python:
+NumPy's overhead per call is larger than the arithmetic here. For many
+games at once, see batchEngine.
+
+Check the kernels against straightforward list scans with
+    python pairs_math.py
+and time them with
+    python pairs_math.py bench
+'''
+from __future__ import division
+from functools import lru_cache
+from math import comb
+
+CACHE = 1 << 16
+
+def countsOf(deck):
+    """The count vector of a list of cards.
+
+    >>> countsOf([1, 3, 3, 10])
+    (0, 1, 0, 2, 0, 0, 0, 0, 0, 0, 1)
+    """
+    counts = [0] * 11
+    for card in deck:
+        counts[card] += 1
+    return tuple(counts)
+
+FULL = countsOf([c for c in range(1, 11) for i in range(c)])
+
+@lru_cache(maxsize = CACHE)
+def pairProb(counts, stack):
+    """The probability that the next card pairs a card in the stack.
+
+    >>> pairProb(FULL, (3, 10))
+    0.23636363636363636
+    """
+    size = sum(counts)
+    return sum([counts[c] / size for c in stack])
+
+@lru_cache(maxsize = CACHE)
+def hitEV(counts, stack):
+    """The expected points of a pair from the next card.
+
+    >>> deck = [c for c in range(1, 11) for i in range(c)][7:]
+    >>> stack = (2, 5, 9)
+    >>> hitEV(countsOf(deck), stack) == sum([deck.count(c) / len(deck) * c
+    ...                                      for c in stack])
+    True
+    """
+    size = sum(counts)
+    return sum([counts[c] / size * c for c in stack])
+
+@lru_cache(maxsize = CACHE)
+def loseProb(counts, stack, score, target):
+    """The probability that the next card pairs the stack for enough
+    points to take a player with this score to the target.
+
+    >>> loseProb(FULL, (3, 9), 10, 21)
+    0
+    >>> loseProb(FULL, (3, 9), 12, 21) == FULL[9] / 55
+    True
+    """
+    size = sum(counts)
+    return sum([counts[c] / size for c in stack if c + score >= target])
+
+@lru_cache(maxsize = CACHE)
+def minCDF(counts, k, replace = True):
+    """P(the smallest of k cards drawn is at most r), indexed by rank r.
+    Without replacement the draws are hypergeometric.
+
+    >>> round(minCDF(FULL, 1)[1] * 55, 12)
+    1.0
+    >>> minCDF(FULL, 2, False)[1] == 1 - comb(54, 2) / comb(55, 2)
+    True
+    """
+    size = sum(counts)
+    cdf = [0.0] * 11
+    below = 0
+    for r in range(1, 11):
+        below += counts[r]
+        if replace:
+            cdf[r] = 1 - (1 - below / size) ** k
+        else:
+            cdf[r] = 1 - comb(size - below, k) / comb(size, k)
+    return tuple(cdf)
+
+@lru_cache(maxsize = CACHE)
+def minPMF(counts, k, replace = True):
+    """P(the smallest of k cards drawn is r), indexed by rank r.
+
+    >>> from itertools import product
+    >>> counts = (0, 1, 2, 0, 0, 0, 0, 0, 0, 0, 3)
+    >>> deck = [1, 2, 2, 10, 10, 10]
+    >>> ref = [0] * 11
+    >>> for draw in product(deck, repeat = 3):
+    ...     ref[min(draw)] += 1 / len(deck) ** 3
+    >>> max([abs(a - b) for a, b in zip(minPMF(counts, 3), ref)]) < 1e-12
+    True
+    >>> from itertools import permutations
+    >>> ref = [0] * 11
+    >>> draws = list(permutations(deck, 3))
+    >>> for draw in draws:
+    ...     ref[min(draw)] += 1 / len(draws)
+    >>> max([abs(a - b) for a, b in
+    ...      zip(minPMF(counts, 3, False), ref)]) < 1e-12
+    True
+    """
+    cdf = minCDF(counts, k, replace)
+    return (0.0,) + tuple([cdf[r] - cdf[r-1] for r in range(1, 11)])
+
+@lru_cache(maxsize = CACHE)
+def minEV(counts, k, replace = True):
+    """The expected smallest of k cards drawn.
+
+    >>> round(minEV(FULL, 1), 12) == round(385 / 55, 12)
+    True
+    """
+    pmf = minPMF(counts, k, replace)
+    return sum([pmf[r] * r for r in range(1, 11)])
+
+@lru_cache(maxsize = CACHE)
+def drawProb(counts, ranks, k, j = None):
+    """The probability that k cards drawn without replacement include one
+    of the ranks, or with j given, exactly j cards of those ranks.
+
+    >>> round(drawProb(FULL, (1,), 1) * 55, 12)
+    1.0
+    >>> drawProb(FULL, (10,), 5, 2) == comb(10, 2) * comb(45, 3) / comb(55, 5)
+    True
+    """
+    size = sum(counts)
+    m = sum([counts[r] for r in ranks])
+    if j is None:
+        return 1 - comb(size - m, k) / comb(size, k)
+    return comb(m, j) * comb(size - m, k - j) / comb(size, k)
+
+def _bench(repeat = 20000):
+    """Time each kernel, cold and cached, against the list scans it
+    replaces."""
+    import random
+    from timeit import timeit
+    rng = random.Random(0)
+    full = [c for c in range(1, 11) for i in range(c)]
+    states = []
+    for i in range(200):
+        deck = rng.sample(full, rng.randint(10, 55))
+        states.append((deck, countsOf(deck),
+                       tuple(sorted(rng.sample(range(1, 11), 3)))))
+
+    def scanEV():
+        for deck, counts, stack in states:
+            sum([deck.count(c) / len(deck) * c for c in stack])
+
+    def kernelEV():
+        for deck, counts, stack in states:
+            hitEV(counts, stack)
+
+    def scanMin():
+        for deck, counts, stack in states:
+            pmf = [deck.count(c) / len(deck) for c in range(1, 11)]
+            cdf = [sum(pmf[0:i]) for i in range(10)]
+            [1 - (1 - c) ** 3 for c in cdf]
+
+    def kernelMin():
+        for deck, counts, stack in states:
+            minEV(counts, 3)
+
+    n = repeat // len(states)
+    for name, scan, kernel, cache in (('hitEV', scanEV, kernelEV, hitEV),
+                                      ('minEV', scanMin, kernelMin, minEV)):
+        t_scan = timeit(scan, number = n) / (n * len(states)) * 1e6
+        cache.cache_clear()
+        minCDF.cache_clear()
+        minPMF.cache_clear()
+        t_cold = timeit(kernel, number = 1) / len(states) * 1e6
+        t_warm = timeit(kernel, number = n) / (n * len(states)) * 1e6
+        print('%-6s scan %6.2f us  kernel %6.2f us cold, %5.2f us cached'
+              % (name, t_scan, t_cold, t_warm))
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ['bench']:
+        _bench()
+    else:
+        import doctest
+        doctest.testmod()
@@ -1,22 +1,211 @@
-import sys
-sys.path.append('./strategies')
-
-from pairsClasses import Dealer
-from pairsClasses import SimpletonStrategy
-from alexStrategies import FixFoldStrategy
-from alexStrategies import RatioFoldStrategy
-
-PLAYERS = 2
-
-for N in range(22,33,2):
-    print("N = "+str(N))
-    losses = [0]*PLAYERS
-    for i in range(10000):
-        d = Dealer(PLAYERS)
-        d.verbose = False
-        d.gameState.players[0].strategy = FixFoldStrategy(3)
-        d.gameState.players[1].strategy = RatioFoldStrategy(N)
-        losses[d.play()] += 1
-
-    print(losses)
-    print()
+# -*- coding: utf-8 -*-
+# Tunes the parameters of a strategy by successive halving
+'''
+paramTuner.py
+Finds good parameters for any strategy that takes them in its constructor.
+Describe the search space as a dict of parameter names and their values,
+either a list to choose from or a Uniform range to sample:
+
+    space = {'ratio': [1.5, 2, 2.5, 3], 'near_death': range(2, 6),
+             'always': [1, 2, 3], 'diff': Uniform(1, 5)}
+    tuner = Tuner(Heuristic, space, {'Fix': FixFoldStrategy(3)},
+                  samples = 40)
+    tuner.run()
+    print(tuner.table())
+
+Every candidate plays the opponents for `games` games. The best 1/eta of
+them, by rate of losses, play eta times as many, and so on until one is
+left or the next round would pass maxGames. Games are seeded by their
+number, so every candidate plays the same deals, and the games of a round
+are spread over a process pool (or a distributed.Coordinator).
+
+The table ranks the candidates by how far they got and then by loss rate,
+with a Wilson interval of the rate at confidence prob.
+'''
+from __future__ import division
+import random
+from itertools import product
+from multiprocessing import cpu_count
+from statistics import NormalDist
+
+from tourney import gamePool, playRanges
+
+class Uniform:
+    """A parameter sampled uniformly from [lo, hi]; integer ones from
+    lo, lo+1, ..., hi."""
+    def __init__(self, lo, hi, integer = False):
+        self.lo = lo
+        self.hi = hi
+        self.integer = integer
+
+    def sample(self, rng):
+        if self.integer:
+            return rng.randint(self.lo, self.hi)
+        return rng.uniform(self.lo, self.hi)
+
+    def __repr__(self):
+        return 'Uniform(%r, %r%s)' % (self.lo, self.hi,
+                                      ', integer = True' * self.integer)
+
+def candidates(space, samples = None, seed = None):
+    """The parameter dicts to try: the whole grid of a space of lists, or
+    `samples` random points of it.
+
+    >>> candidates({'a': [1, 2], 'b': ['x', 'y']})
+    [{'a': 1, 'b': 'x'}, {'a': 1, 'b': 'y'}, {'a': 2, 'b': 'x'}, {'a': 2, 'b': 'y'}]
+    >>> points = candidates({'a': Uniform(0, 1), 'b': [3]}, 5, seed = 1)
+    >>> len(points), all(0 <= p['a'] <= 1 and p['b'] == 3 for p in points)
+    (5, True)
+    """
+    names = list(space)
+    if samples is None:
+        if any(isinstance(v, Uniform) for v in space.values()):
+            raise ValueError("Sampled parameters need a number of samples.")
+        return [dict(zip(names, values))
+                for values in product(*[list(space[n]) for n in names])]
+    rng = random.Random(seed)
+    return [{n: (space[n].sample(rng) if isinstance(space[n], Uniform)
+                 else rng.choice(list(space[n]))) for n in names}
+            for i in range(samples)]
+
+def wilson(lost, games, prob = 0.95):
+    """Wilson score interval of a loss rate.
+
+    >>> [round(x, 3) for x in wilson(40, 100)]
+    [0.309, 0.498]
+    """
+    if not games:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + prob) / 2)
+    rate = lost / games
+    centre = (rate + z * z / (2 * games)) / (1 + z * z / games)
+    half = (z / (1 + z * z / games) *
+            (rate * (1 - rate) / games + z * z / (4 * games * games)) ** 0.5)
+    return centre - half, centre + half
+
+class Tuner:
+    """Successive halving over the candidates of a search space.
+
+    factory(**params) builds a strategy; opponents is a dict of strategies
+    like Tourney's.
+
+    >>> from strategies.alexStrategies import FixFoldStrategy, RatioFoldStrategy
+    >>> tuner = Tuner(RatioFoldStrategy, {'N': [10, 26, 60]},
+    ...               {'Fix': FixFoldStrategy(3)}, games = 30, maxGames = 90,
+    ...               workers = 1, seed = 'doc', verbose = False)
+    >>> best = tuner.run()
+    >>> best['games'], len(tuner.results)
+    (90, 3)
+    """
+    def __init__(self, factory, space, opponents, games = 200, eta = 3,
+                 maxGames = 20000, samples = None, workers = None,
+                 seed = None, duplicate = False, prob = 0.95, cluster = None,
+                 verbose = True):
+        self.factory = factory
+        self.space = space
+        self.opponents = opponents
+        for key, value in opponents.items():
+            value.tourney_key = key
+        self.games = games
+        self.eta = eta
+        self.maxGames = maxGames
+        self.workers = cpu_count() if workers is None else workers
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.duplicate = duplicate
+        self.prob = prob
+        self.cluster = cluster
+        self.verbose = verbose
+        # one record per candidate: its params, games played, losses and the
+        # round it reached
+        self.results = [{'params': params, 'games': 0, 'lost': 0, 'round': 0}
+                        for params in candidates(space, samples, self.seed)]
+        if not self.results:
+            raise ValueError("The search space is empty.")
+
+    def run(self):
+        """Race the candidates and return the record of the best."""
+        with gamePool(self.workers, self.cluster) as pool:
+            alive = list(range(len(self.results)))
+            target = self._round(self.games)
+            r = 0
+            while True:
+                if self.verbose:
+                    print('Round %d: %d candidates to %d games' %
+                          (r, len(alive), target))
+                self._evaluate(pool, alive, target)
+                nxt = self._round(target * self.eta)
+                if len(alive) == 1 or nxt > self.maxGames:
+                    break
+                alive.sort(key = self._rate)
+                alive = alive[:max(1, len(alive) // self.eta)]
+                r += 1
+                for i in alive:
+                    self.results[i]['round'] = r
+                target = nxt
+        return self.ranking()[0]
+
+    def _round(self, games):
+        """games, rounded up to whole duplicate blocks."""
+        if not self.duplicate:
+            return games
+        n = len(self.opponents) + 1
+        return -(-games // n) * n
+
+    def _rate(self, i):
+        r = self.results[i]
+        return r['lost'] / r['games'], i
+
+    def _field(self, i):
+        strats = dict(self.opponents)
+        strats['candidate'] = self.factory(**self.results[i]['params'])
+        strats['candidate'].tourney_key = 'candidate'
+        return strats
+
+    def _evaluate(self, pool, alive, target):
+        """Play each candidate in alive up to target games on the pool."""
+        ranges = [(self._field(i), self.seed, self.results[i]['games'],
+                   target - self.results[i]['games']) for i in alive]
+        played = playRanges(pool, ranges, self.workers, self.duplicate)
+        for i, (losers, stats) in zip(alive, played):
+            self.results[i]['games'] += len(losers)
+            self.results[i]['lost'] += losers.count('candidate')
+
+    def ranking(self):
+        """The records, furthest round first, then lowest loss rate."""
+        order = sorted(range(len(self.results)),
+                       key = lambda i: (-self.results[i]['round'],
+                                        self._rate(i)))
+        return [self.results[i] for i in order]
+
+    def table(self):
+        """The ranking as text, with intervals of the loss rates."""
+        lines = ['%4s %7s %17s %7s  %s' % ('rank', 'lost', 'interval',
+                                           'games', 'parameters')]
+        for rank, r in enumerate(self.ranking(), 1):
+            lo, hi = wilson(r['lost'], r['games'], self.prob)
+            params = ', '.join('%s = %s' % (k, _fmt(v))
+                               for k, v in r['params'].items())
+            lines.append('%4d %6.1f%% %7.1f%% - %5.1f%% %7d  %s' %
+                         (rank, 100 * r['lost'] / r['games'], 100 * lo,
+                          100 * hi, r['games'], params))
+        return '\n'.join(lines)
+
+def _fmt(value):
+    return '%.4g' % value if isinstance(value, float) else repr(value)
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ['test']:
+        import doctest
+        doctest.testmod()
+    else:
+        from strategies.alexStrategies import FixFoldStrategy
+        from strategies.alexStrategies import RatioFoldStrategy
+        # RatioFoldStrategy against FixFoldStrategy(3), as the old sweep had
+        # it, but in the tourneys' standard games and over a wider range of
+        # N; the sweep played continuous games with N from 22 to 32
+        tuner = Tuner(RatioFoldStrategy, {'N': range(10, 61, 2)},
+                      {'Fix': FixFoldStrategy(3)}, games = 300,
+                      maxGames = 30000, seed = 'paramTuner')
+        tuner.run()
+        print(tuner.table())
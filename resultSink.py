@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# JSON lines output for the progress records of Tourney.stream
+'''
+resultSink.py
+Writes the records that Tourney.stream and GrandTourney.stream yield as
+JSON lines, one record per line, and reads them back. Lines are buffered
+and written a block at a time, and a sink holds no records itself, so a
+long run streams its results in constant memory:
+
+    with JsonlSink('tourney_log.jsonl') as sink:
+        for record in tourney.stream():
+            sink.write(record)
+
+and later
+
+    for record in read('tourney_log.jsonl'):
+        print(record['games'], record['lost'])
+'''
+import json
+
+class JsonlSink:
+    """Appends records to a JSON lines file through a buffer of `buffer`
+    bytes; flush() pushes out what is buffered.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'log.jsonl')
+    >>> with JsonlSink(path) as sink:
+    ...     sink.write({'games': 100, 'lost': {'a': 40, 'b': 60}})
+    ...     sink.write({'games': 200, 'lost': {'a': 90, 'b': 110}})
+    >>> [r['games'] for r in read(path)]
+    [100, 200]
+    """
+    def __init__(self, path, buffer = 1 << 16):
+        self.path = path
+        self._file = open(path, 'a', buffering = buffer)
+        self._dumps = json.JSONEncoder(separators = (',', ':')).encode
+
+    def write(self, record):
+        self._file.write(self._dumps(record) + '\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read(path):
+    """Yield the records of a JSON lines file, skipping a last line left
+    unfinished by a crash."""
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# Persistent results of the subset tourneys of a GrandTourney
+'''
+resultsStore.py
+Keeps the losses of every subset Tourney a GrandTourney has played, keyed
+by who played: the identity of each strategy is a hash of the source of
+its module and of the repository modules that uses, and of the arguments
+it was built with. A GrandTourney given a
+store plays only the subsets whose results it lacks, so adding a strategy
+plays just the subsets that include it, and editing one replays just the
+subsets it is in:
+
+    GrandTourney(strategies, store = 'grand_results.jsonl').play()
+
+Results are only reused between tourneys with the same games, check, prob,
+prior and duplicate settings. The file is JSON lines, appended to as each
+subset finishes.
+'''
+import hashlib
+import inspect
+import json
+import os
+import weakref
+
+from resultSink import read
+
+# the directories of this repository's modules and of its strategies
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ROOTS = (_HERE, os.path.join(_HERE, 'strategies'))
+# the parameters of each strategy when identity first saw it
+_seen = weakref.WeakKeyDictionary()
+# attributes set by the tourneys rather than by the strategy
+_RUNTIME = ('player', 'tourney_key')
+
+def _plain(value, depth = 0):
+    """value as something json can write, objects as their class and
+    attributes."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_plain(v, depth) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _plain(v, depth) for k, v in sorted(value.items())}
+    if isinstance(value, type) or callable(value):
+        return getattr(value, '__qualname__', type(value).__qualname__)
+    if hasattr(value, '__dict__') and depth < 3:
+        return {type(value).__qualname__: _state(value, depth + 1)}
+    return type(value).__qualname__
+
+def _state(obj, depth = 0):
+    return {k: _plain(v, depth) for k, v in sorted(vars(obj).items())
+            if k not in _RUNTIME and not k.startswith('gt_')}
+
+def _params(strategy):
+    """The parameters of a strategy: the attributes named after those of
+    its __init__, or its whole state if it keeps one under another name.
+    They are taken the first time a strategy is seen, which for a
+    GrandTourney is before it plays, and kept, so that a strategy that
+    changes its state as it plays keeps its identity."""
+    try:
+        return _seen[strategy]
+    except KeyError:
+        pass
+    except TypeError: # unhashable or not weakly referable
+        return _described(strategy)
+    params = _seen[strategy] = _described(strategy)
+    return params
+
+def _described(strategy):
+    try:
+        names = list(inspect.signature(type(strategy).__init__).parameters)
+    except (TypeError, ValueError):
+        names = []
+    params = {}
+    for name in names[1:]:
+        if name in ('args', 'kwargs'):
+            continue
+        if name not in vars(strategy):
+            return _state(strategy)
+        params[name] = _plain(vars(strategy)[name])
+    return params
+
+def _sources(cls):
+    """The source of the module that defines cls and of the modules of this
+    repository it takes names from, such as pairs_math, so that editing a
+    helper function changes the identity too."""
+    module = inspect.getmodule(cls)
+    if module is None:
+        return ''
+    modules = {module}
+    for value in vars(module).values():
+        used = value if inspect.ismodule(value) else inspect.getmodule(value)
+        path = getattr(used, '__file__', None)
+        if path and os.path.dirname(os.path.abspath(path)) in _ROOTS:
+            modules.add(used)
+    sources = []
+    for m in sorted(modules, key = lambda m: m.__name__):
+        try:
+            sources.append(inspect.getsource(m))
+        except (OSError, TypeError):
+            pass
+    return '\n'.join(sources)
+
+def identity(strategy):
+    """A hash of the source of a strategy's module and the repository
+    modules it uses, of its class's `version` if it has one, and of its
+    parameters. Playing does not change it.
+
+    >>> from strategies.alexStrategies import FixFoldStrategy
+    >>> identity(FixFoldStrategy(3)) == identity(FixFoldStrategy(3))
+    True
+    >>> identity(FixFoldStrategy(3)) == identity(FixFoldStrategy(4))
+    False
+    >>> from tourney import _play_game
+    >>> from strategies.chrisStrategies import Weights
+    >>> w = Weights()
+    >>> before = identity(w)
+    >>> w.tourney_key, f = 'w', FixFoldStrategy()
+    >>> f.tourney_key = 'f'
+    >>> for g in range(5):
+    ...     loser = _play_game({'w': w, 'f': f}, 'id-%d' % g)
+    >>> identity(w) == before, identity(w) == identity(Weights(weight = 'exp'))
+    (True, False)
+    """
+    cls = type(strategy)
+    blob = json.dumps({'class': '%s.%s' % (cls.__module__, cls.__qualname__),
+                       'source': _sources(cls),
+                       'version': _plain(getattr(cls, 'version', None)),
+                       'params': _params(strategy)}, sort_keys = True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+class ResultsStore:
+    """Losses of subset tourneys by the identities of the subset and the
+    tourney settings.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'results.jsonl')
+    >>> store = ResultsStore(path)
+    >>> settings = {'games': 100}
+    >>> store.put(['b1', 'a2'], settings, {'b1': 60, 'a2': 40})
+    >>> ResultsStore(path).get(['a2', 'b1'], settings)
+    {'b1': 60, 'a2': 40}
+    >>> store.get(['a2', 'b1'], {'games': 200}) is None
+    True
+    """
+    def __init__(self, path):
+        self.path = path
+        self._results = {}
+        if os.path.exists(path):
+            # a last line cut short by a crash is dropped, and its subset
+            # replayed
+            for record in read(path):
+                self._results[record['key']] = record['lost']
+            tmp = path + '.tmp'
+            with open(tmp, 'w') as f:
+                for key, lost in self._results.items():
+                    f.write(json.dumps({'key': key, 'lost': lost}) + '\n')
+            os.replace(tmp, path)
+
+    @staticmethod
+    def key(ids, settings):
+        return json.dumps([sorted(ids), settings], sort_keys = True)
+
+    def get(self, ids, settings):
+        """The losses by identity, or None if this subset was not played
+        with these settings."""
+        return self._results.get(self.key(ids, settings))
+
+    def put(self, ids, settings, lost):
+        key = self.key(ids, settings)
+        self._results[key] = lost
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'key': key, 'lost': lost}) + '\n')
+
+    def __len__(self):
+        return len(self._results)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Sequential stopping rules for Tourney
+'''
+sequential.py
+Posterior probabilities that each strategy is the best (fewest losses) or
+the worst, and how many games to play before looking again.
+
+DirichletTest replaces the 10,000 Dirichlet draws Tourney used to make at
+every check. The argmin and argmax of a Dirichlet vector are those of its
+independent Gamma components, and for the shape parameters Tourney uses
+(prior of 500 plus losses) the Wilson-Hilferty cube-root transform makes
+each Gamma an explicit function of a standard normal. P(best) and P(worst)
+are then one-dimensional normal expectations, taken on a fixed quantile
+grid: deterministic, and cached by posterior.
+
+PairedTest does the same job for duplicate mode, whose posterior is a
+multivariate t, with one fixed, seeded set of draws.
+'''
+from __future__ import division
+import numpy as np
+
+def _phi(z):
+    """Standard normal CDF to within 1e-7 (Abramowitz and Stegun 7.1.26)."""
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    erf = 1 - t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 +
+          t * (-1.453152027 + t * 1.061405429)))) * np.exp(-x * x)
+    return 0.5 * (1 + np.sign(z) * erf)
+
+def _nodes(m):
+    """Standard normal quantiles at the midpoints of m equal slices."""
+    from statistics import NormalDist
+    inv = NormalDist().inv_cdf
+    return np.array([inv((k + 0.5) / m) for k in range(m)])
+
+class DirichletTest:
+    """P(best) and P(worst) under a Dirichlet(prior + losses) posterior on
+    the loss shares of n strategies.
+
+    >>> t = DirichletTest(3, 500)
+    >>> best, worst = t.probs([0, 0, 0])
+    >>> [round(b, 3) for b in best]
+    [0.333, 0.333, 0.333]
+    >>> best, worst = t.probs([300, 400, 500])
+    >>> reference = np.random.default_rng(0).dirichlet([800, 900, 1000],
+    ...                                               200000)
+    >>> ref_best = np.bincount(reference.argmin(1), minlength = 3) / 200000
+    >>> bool(np.abs(best - ref_best).max() < 0.01)
+    True
+    >>> t.stop(best, worst, 0.95)
+    True
+    """
+
+    def __init__(self, n, prior, nodes = 512):
+        self.n = n
+        self.prior = prior
+        self.z = _nodes(nodes)
+        self._cache = {}
+
+    def probs(self, lost):
+        """Arrays of P(best) and P(worst) given the losses of each strategy."""
+        key = tuple(lost)
+        if key not in self._cache:
+            if len(self._cache) > 1000:
+                self._cache.clear()
+            self._cache[key] = self._probs(np.array(key) + self.prior)
+        return self._cache[key]
+
+    def _probs(self, a):
+        a = a[:, None].astype(float)
+        c = 1 - 1 / (9 * a)
+        s = 1 / (3 * np.sqrt(a))
+        # Gamma(a_i) at each node, then every strategy's normal score there
+        x = a * np.maximum(c + s * self.z, 0) ** 3
+        z = ((x[:, None, :] / a[None]) ** (1 / 3) - c[None]) / s[None]
+        above = 1 - _phi(z)
+        eye = np.eye(self.n, dtype = bool)[:, :, None]
+        best = np.where(eye, 1, above).prod(1).mean(1)
+        worst = np.where(eye, 1, 1 - above).prod(1).mean(1)
+        return best / best.sum(), worst / worst.sum()
+
+    def stop(self, best, worst, prob):
+        return max(best) > prob and max(worst) > prob
+
+    def nextCheck(self, games, best, worst, prob, check, low = 0.25,
+                  high = 8):
+        """Games to play before the next test. Evidence grows like the square
+        root of the games played, so the normal score of the leading
+        probability projects when the threshold will be crossed; the next
+        test comes halfway there, between low and high times `check`."""
+        from statistics import NormalDist
+        inv = NormalDist().inv_cdf
+        need = inv(prob)
+        projected = games
+        for p in (max(best), max(worst)):
+            have = inv(min(max(p, 1e-9), 1 - 1e-9))
+            if have <= 0:
+                projected = float('inf')
+            else:
+                projected = max(projected, games * (need / have) ** 2)
+        step = (projected - games) / 2
+        return int(min(max(step, low * check), high * check)) or 1
+
+class PairedTest(DirichletTest):
+    """P(best) and P(worst) when the mean losses per deal have a Student t
+    posterior with a given mean, covariance and degrees of freedom, using
+    one fixed set of seeded draws. The covariance is estimated from few
+    deals early on, so it is not used before minBlocks of them.
+
+    >>> t = PairedTest(3, seed = 0)
+    >>> mean, cov = np.array([1.2, 1.0, 0.8]), np.eye(3) * 0.01
+    >>> [round(p, 2) for p in t.probs(mean, cov)[0]]
+    [0.0, 0.08, 0.92]
+    >>> [round(p, 2) for p in t.probs(mean, cov, df = 2)[0]]
+    [0.03, 0.14, 0.83]
+    """
+    minBlocks = 10
+
+    def __init__(self, n, draws = 10000, seed = 0):
+        from zlib import crc32
+        if not isinstance(seed, int):
+            seed = crc32(str(seed).encode())
+        self.n = n
+        self.seed = seed
+        self.normal = np.random.default_rng(seed).standard_normal((draws, n))
+
+    def probs(self, mean, cov, df = None):
+        values, vectors = np.linalg.eigh(cov)
+        root = vectors * np.sqrt(np.maximum(values, 0))
+        draws = self.normal.dot(root.T)
+        if df is not None:
+            # a covariance estimated from df + 1 deals: multivariate t
+            chi2 = np.random.default_rng(self.seed).chisquare(df, len(draws))
+            draws *= np.sqrt(df / chi2)[:, None]
+        draws += mean
+        N = len(draws)
+        best = np.bincount(draws.argmin(1), minlength = self.n) / N
+        worst = np.bincount(draws.argmax(1), minlength = self.n) / N
+        return best, worst
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
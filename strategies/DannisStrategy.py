@@ -22,14 +22,15 @@ class DannisStrategy:
 		self.Counter = Counter
 		self.PercentHit = PercentHit
 	def play(self, info):
-		# current deck list
-		deck = self.Counter(info.deck)
+		ctx = info.context
+		# count of each rank in the deck
+		deck = ctx.counts
 		#best fold as tuple (playerIndex, card)
-		best = info.bestFold(self.player)
+		best = ctx.bestFold(self.player._index)
 		# list of current hand
 		stack = self.player.stack
 		# if best fold is greater than expected value of points (based on cards in deck), hit
-		if (best[1] > self.PercentHit * sum([card*deck[card] for card in deck])/len(info.deck) + sum([card*deck[card]/len(info.deck) for card in stack])):
+		if (best[1] > self.PercentHit * sum([card*deck[card] for card in range(1, 11)])/ctx.deckSize + sum([card*deck[card]/ctx.deckSize for card in stack])):
 			return "hit"
 		# if best fold is less than expected value of points (based on cards in deck), fold
 		return best
@@ -40,11 +41,10 @@ class NoCardKnowledge:
 		self.N = N
 
 	def play(self, info):
-		# get the number of players
-		NumPlayers = info.noPlayers
-		highestScore = max(int(60 / NumPlayers) + 1, 11)
+		ctx = info.context
+		highestScore = ctx.target
 		# get best fold as tuple (playerIndex, card)
-		best = info.bestFold(self.player)
+		best = ctx.bestFold(self.player._index)
 		# get current hand
 		points = self.player.points
 		stack = self.player.stack
@@ -57,3 +57,9 @@ class NoCardKnowledge:
 			return best
 		return "Hit"
 
+	def playBatch(self, state):
+		# the same rules on a batchEngine.BatchState
+		return ((state.best <= self.N) |
+			(state.stackMean + state.score >= state.target) |
+			(state.score > 18*state.best))
+
@@ -7,6 +7,8 @@ class FixFoldStrategy:
             return 'Hit me'
         else:
             return 'fold'
+    def playBatch(self, state):
+        return state.best <= self.N
 
 class RatioFoldStrategy:
     """This strategy folds more readily as their stack grows worse"""
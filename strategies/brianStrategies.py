@@ -2,6 +2,7 @@ from __future__ import division
 from math import ceil
 from copy import copy
 import numpy
+from pairs_math import hitEV, loseProb
 
 class FoldLowWithHigh:
     def __init__(self, fold, hand):
@@ -50,19 +51,15 @@ class simpleExp:
 
     def play(self, info):
         self.discards = info.discards
-        deck = info.deck
         hand = tuple(self.player.stack)
         best = info.bestFold(self.player)
         if best[1] <= 2:
              return best
-        elif best[1] <= sum([self._p_deal(c, deck) * c for c in hand]) and (11-sum(info.inPoints()))/info.noPlayers > best[1] :
+        elif best[1] <= hitEV(info.context.counts, hand) and (11-sum(info.inPoints()))/info.noPlayers > best[1] :
              return best
         else:
              return "booger"
 
-    def _p_deal(self, c, deck):
-        return deck.count(c) / len(deck)
-
 class simpleExp2:
     '''
     takes low cards.
@@ -73,21 +70,17 @@ class simpleExp2:
 
     def play(self, info):
         self.discards = info.discards
-        deck = info.deck
         hand = tuple(self.player.stack)
         best = info.bestFold(self.player)
         if best[1] <= 2:
              return best
-        elif best[1] <= sum([self._p_deal(c, deck) * c for c in hand]):
+        elif best[1] <= hitEV(info.context.counts, hand):
              return best
         elif sum(info.inPoints())/info.noPlayers > 6 and best[1] < 6:
              return best
         else:
              return "booger"
 
-    def _p_deal(self, c, deck):
-        return deck.count(c) / len(deck)
-
 class noPeek:
     '''
     strategy not requiring deck
@@ -112,20 +105,17 @@ class trad:
     '''
 
     def play(self, info):
-        deck = info.deck
+        counts = info.context.counts
         hand = tuple(self.player.stack)
         best = info.bestFold(self.player)
         points = tuple(self.player.points)
         opp = [pl for pl in info.players if pl != self.player]
         if sum(points) + max(hand) < 11:
             return "booger"
-        elif sum([self._p_deal(c, deck) * c for c in hand]) > best[1] + 1 and sum([1 if sum([self._p_deal(c, deck) * c for c in hand]) > sum([self._p_deal(c, deck) * c for c in p.stack])  else 0 for p in opp] ) >= (info.noPlayers - 1):
+        elif hitEV(counts, hand) > best[1] + 1 and sum([1 if hitEV(counts, hand) > hitEV(counts, tuple(p.stack))  else 0 for p in opp] ) >= (info.noPlayers - 1):
             return best
-        elif sum([self._p_deal(c, deck) * (c + sum(points) >=11) for c in hand]) > 1 - numpy.product([ 1 - sum([self._p_deal(c, deck) * (c + sum(p.points) >=11) for c in p.stack])  for p in opp] ):
+        elif loseProb(counts, hand, sum(points), 11) > 1 - numpy.prod([ 1 - loseProb(counts, tuple(p.stack), sum(p.points), 11)  for p in opp] ):
             return best
         else:
             return "booger"
 
-    def _p_deal(self, c, deck):
-        return deck.count(c) / len(deck)
-
@@ -1,6 +1,7 @@
 from __future__ import division
-from copy import copy
+from functools import lru_cache
 from math import log
+from pairs_math import loseProb, minPMF
 
 class FoldLowWithHigh:
     def __init__(self, fold, hand):
@@ -47,42 +48,44 @@ class Expectation3:
              return fold
         return ev_hit
 
-    def _p_deal(self, c, deck):
-        return deck.count(c) / len(deck)
-
-    def _p_fold(self, c, deck):
-        return self._p_deal(c, deck)
-
-    def _hit(self, hand, deck, trn):
-        return sum([self._p_deal(c, deck) * c for c in hand]) / (trn+1)
-
-    def _fold(self, ev_hit, deck, trn):
-        prob = sum([self._p_fold(c, deck) for c in self.cards if c < ev_hit])
-        ev = 0
-        if prob > 0:
-            ev = sum([self._p_fold(c, deck) * c for c in self.cards if c < ev_hit]) / prob / (trn+1)
-        return (prob, ev)
-
-    def _reshuffle(self, deck):
-        return self.discards + deck
+    def _counts(self, deck):
+        counts = [0] * len(self.cards)
+        for c in deck:
+            counts[c-1] += 1
+        return tuple(counts)
 
     def _turn(self, hand, deck, trn):
-        ev_hit = self._hit(hand, deck, trn)
-        if trn < self.TURN_MAX:
-            for c in self.cards:
-                if c not in hand and c in deck:
-                    d = copy(deck)
-                    d.remove(c)
-                    if len(d) == self.burn:
-                        d = self._reshuffle(d)
-                    ev_hit += self._turn(hand + tuple([c]), d, trn+1) * self._p_deal(c, deck)
-
-        if trn == 1:
-            return ev_hit
-        f = self._fold(ev_hit, deck, trn)
-        p_fold = f[0]
-        ev_fold = f[1]
-        return p_fold * ev_fold + (1-p_fold) * ev_hit
+        counts = self._counts(deck)
+        # the discards only matter if the search can reach a reshuffle
+        discards = None
+        if len(deck) - (self.TURN_MAX - trn) <= self.burn:
+            discards = self._counts(self.discards)
+        return _search(tuple(sorted(hand)), counts, discards, trn,
+                       self.TURN_MAX, self.burn)
+
+@lru_cache(maxsize = 1 << 18)
+def _search(hand, counts, discards, trn, turn_max, burn):
+    """Expectation3's search on a rank-count deck. Results are cached by the
+    sorted hand, the deck counts and the turn, across calls and games."""
+    size = sum(counts)
+    ev_hit = sum([counts[c-1] * c for c in hand]) / size / (trn+1)
+    if trn < turn_max:
+        for c, n in enumerate(counts, 1):
+            if n and c not in hand:
+                d = counts[:c-1] + (n - 1,) + counts[c:]
+                if size - 1 == burn:
+                    d = tuple([x + y for x, y in zip(d, discards)])
+                ev_hit += _search(tuple(sorted(hand + (c,))), d, discards,
+                                  trn+1, turn_max, burn) * n / size
+
+    if trn == 1:
+        return ev_hit
+    p_fold = sum([n for c, n in enumerate(counts, 1) if c < ev_hit]) / size
+    ev_fold = 0
+    if p_fold > 0:
+        ev_fold = (sum([n * c for c, n in enumerate(counts, 1) if c < ev_hit])
+                   / size / p_fold / (trn+1))
+    return p_fold * ev_fold + (1-p_fold) * ev_hit
 
 class Heuristic:
     '''
@@ -95,17 +98,15 @@ class Heuristic:
         self.diff = diff
 
     def play(self, info):
+        ctx = info.context
         hand = self.player.stack
-        fold = info.bestFold(self.player)
+        fold = ctx.bestFold(self.player._index)
         if(fold[1] <= self.always):
             return fold
         if(sum(hand) / fold[1] > self.ratio and max(hand) - fold[1] >= self.diff):
             return fold
-        play_to = max(11, 60 / info.noPlayers + 1)
-        scores = []
-        for i in range(info.noPlayers):
-            scores.append(info.players[i].getScore())
-        if play_to - max(scores) <= self.nd and max(hand) + self.player.getScore() >= play_to:
+        play_to = ctx.target
+        if play_to - max(ctx.scores) <= self.nd and max(hand) + self.player.getScore() >= play_to:
             return fold
         return "hit"
 
@@ -121,17 +122,15 @@ class SmartRatio:
         self.always = always
 
     def play(self, info):
+        ctx = info.context
         hand = self.player.stack
-        fold = info.bestFold(self.player)
+        fold = ctx.bestFold(self.player._index)
         # cards always fold for
         if(fold[1] <= self.always):
             return fold
-        play_to = max(11, 60 / info.noPlayers + 1)
+        play_to = ctx.target
         # when to start 'end-game' folding
-        scores = []
-        for i in range(info.noPlayers):
-            scores.append(info.players[i].getScore())
-        if play_to - max(scores) <= self.nd and max(hand) + self.player.getScore() >= play_to:
+        if play_to - max(ctx.scores) <= self.nd and max(hand) + self.player.getScore() >= play_to:
             return fold
         # general fold rule
         if sum(hand) / fold[1] >= (self.start + self.inc*len(hand)):
@@ -164,22 +163,21 @@ class PureExp:
         self.nd = nd
 
     def play(self, info):
+        ctx = info.context
         hand = self.player.stack
-        fold = info.bestFold(self.player)
-        play_to = max(60 / len(info.players) + 1, 11)
-        scores = [p.getScore() for p in info.players]
-        if (play_to - max(scores) <= self.nd and max(hand) + 
+        fold = ctx.bestFold(self.player._index)
+        play_to = ctx.target
+        if (play_to - max(ctx.scores) <= self.nd and max(hand) + 
             self.player.getScore() >= play_to):
             return fold
-        if fold[1] < self.mult * self._ev_hit(self.player.stack, info.deck):
+        if fold[1] < self.mult * ctx.evHit(self.player._index):
             return fold
         return "hit"
 
-    def _ev_hit(self, hand, deck):
-        return sum([self._p_deal(c, deck) * c for c in hand])
-
-    def _p_deal(self, c, deck):
-        return deck.count(c) / len(deck)
+    def playBatch(self, state):
+        near = ((state.target - state.scores.max(1) <= self.nd) &
+                (state.highCard + state.score >= state.target))
+        return near | (state.best < self.mult * state.evHit)
 
 
 class ExpProb:
@@ -192,16 +190,13 @@ class ExpProb:
         self.safe = safe
 
     def play(self, info):
-        hand = self.player.stack
-        fold = info.bestFold(self.player)
-        play_to = max(60 / len(info.players) + 1, 11)
+        ctx = info.context
+        fold = ctx.bestFold(self.player._index)
+        play_to = ctx.target
         lose_probs = []
         for p in info.players:
-            p_lose = 0
-            for c in p.stack:
-                if c + p.getScore() >= play_to:
-                    p_lose += self._p_deal(c, info.deck)
-            lose_probs.append(p_lose)
+            lose_probs.append(loseProb(ctx.counts, tuple(p.stack),
+                                       p.getScore(), play_to))
         mine = lose_probs[self.player._index]
         lose_probs.remove(mine)
         other = max(lose_probs)
@@ -209,16 +204,10 @@ class ExpProb:
             return fold
         if other > self.other_prob and mine < self.safe:
             return "hit"
-        if fold[1] < self.mult * self._ev_hit(self.player.stack, info.deck):
+        if fold[1] < self.mult * ctx.evHit(self.player._index):
             return fold
         return "hit"
 
-    def _p_deal(self, c, deck):
-        return deck.count(c) / len(deck)
-
-    def _ev_hit(self, hand, deck):
-        return sum([self._p_deal(c, deck) * c for c in hand])
-
 
 class Weights:
 
@@ -253,42 +242,44 @@ class Weights:
         return self.mult * ((12-k) ** self.exp - 1) + 1
 
     def play(self, info):
+        ctx = info.context
         self.bu.player = self.player
         n = len(info.players)
         if n == 2:
             self.eps = .1
         if n == 3:
             self.eps = .05
-        max_sc = max(60 / n + 1, 11)
-        fold = info.bestFold(self.player)
+        max_sc = ctx.target
+        fold = ctx.bestFold(self.player._index)
         me = self.player._index
 
-        if len(info.deck) < self.burn + n: # reshuffle will occur during round
-            self.deck = []
-            for i in range(1, 11):
-                self.deck += [i] * i
+        if ctx.deckSize < self.burn + n: # reshuffle will occur during round
+            self.deck = list(range(11))
             for i in info.inPoints() + info.inStacks():
-                self.deck.remove(i)
-        deck = info.deck
-        if len(deck) == self.burn:
+                self.deck[i] -= 1
+            self.deck = tuple(self.deck)
+        deck = ctx.counts
+        if ctx.deckSize == self.burn:
             deck = self.deck
         p_lose_fold = self._p_lose_new(fold[1], info, me) 
         p_lose_hit = p_pair = 0
         for c in self.player.stack:
-            p_pair += self._p_deal(c, info.deck)
-            p_lose_hit += (self._p_deal(c, info.deck) * 
+            p_pair += ctx.probs[c]
+            p_lose_hit += (ctx.probs[c] * 
                            self._p_lose_new(c, info, me))
         p_nxt = 1 - p_pair
 
+        size = sum(deck)
         for i in range(n-1):
             j = (me + i + 1) % n
-            if len(deck) == self.burn + (i+1):
+            if size == self.burn + (i+1):
                 deck = self.deck
+                size = sum(deck)
             # for now assume other players always hit
             p_pair = 0
             for c in info.players[j].stack:
-                p_pair += self._p_deal(c, deck)
-                p_lose_hit += (p_nxt * self._p_deal(c, deck) *
+                p_pair += deck[c] / size
+                p_lose_hit += (p_nxt * deck[c] / size *
                                self._p_lose_new(c, info, j))
             p_nxt *= 1 - p_pair
         # if reach next turn, terminal value is expected fold or
@@ -306,15 +297,12 @@ class Weights:
             return fold
         return "hit"
 
-    def _p_deal(self, c, deck):
-        return deck.count(c) / len(deck)
-
     def _exp_fold(self, deck, trials):
-        pmf = [self._p_deal(c, deck) for c in range(1, 11)]
-        cdf = [sum(pmf[0:i]) for i in range(10)]
-        min_cdf = [1 - (1-c) ** trials for c in cdf]
-        min_pmf = [min_cdf[0]] + [min_cdf[i+1] - min_cdf[i] for i in range(9)]
-        return sum(min_pmf[c-1] * c for c in range(1,11))
+        # not the expected smallest card: the original cdf was off by one,
+        # scoring each card one above the smallest and a 10 as nothing. That
+        # is kept on purpose so that Weights decides as it always has.
+        pmf = minPMF(deck, trials)
+        return sum([pmf[c] * (c+1) for c in range(1, 10)])
 
     def _p_lose_new(self, c, info, idx):
         max_sc = max(11, 60 / len(info.players) + 1)
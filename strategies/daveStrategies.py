@@ -9,12 +9,16 @@ class expValue:
         self.Counter = Counter
 
     def play(self, info):
-        cards = self.Counter(info.deck)
-        if info.bestFold(self.player)[1] > sum([card*cards[card]/len(info.deck) for card in self.player.stack]):
+        ctx = info.context
+        cards = ctx.counts
+        if ctx.bestFold(self.player._index)[1] > sum([card*cards[card]/ctx.deckSize for card in self.player.stack]):
             return 'Hit me'
         else:
             return 'fold'
 
+    def playBatch(self, state):
+        return state.best <= state.evHit
+
 class otherShoe:
     """This strategy folds based on card counting expectation values."""
     def __init__(self):
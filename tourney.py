@@ -6,9 +6,15 @@ Strategies to play in the tournament need to be imported, initialized,
 and passed to tournament function.
 '''
 from __future__ import division
+from contextlib import contextmanager
+from copy import deepcopy
 from itertools import chain, combinations
+import json
+import os
+import time
 import pairsClasses as p
-from random import shuffle
+import random
+from gameStats import GameStats
 try:
     import numpy as np
     numpy = True
@@ -40,10 +46,133 @@ strategies = {"Michael": OverThinkerJrTHEDESTROYER(),
 for key, value in strategies.items():
     value.tourney_key = key
 
+# the most players a game of Pairs can seat
+MAX_SEATS = 8
+
+def gameSeed(seed, g):
+    """Seed for game g of the tourney seeded with seed. String seeds are
+    hashed the same way on every platform and process."""
+    return '%s-%d' % (seed, g)
+
+def _game_args(seed, g, n, duplicate):
+    """Seed and seat rotation of game g. In duplicate mode every block of n
+    games replays one deal, once for each rotation of the seats."""
+    if duplicate:
+        return gameSeed(seed, g // n), g % n
+    return gameSeed(seed, g), 0
+
+def _play_game(strats, seed, rotation = 0, timeLimit = None, stats = None):
+    """Play one game with the strategies in random seats, rotated by
+    rotation, and return the tourney_key of the loser. The rotation happens
+    after the shuffle, so every rotation of a seed sees the same cards."""
+    d = p.Dealer(len(strats), verbose = False, standard = True,
+                 calamity = False, seed = seed, timeLimit = timeLimit,
+                 onTimeout = 'disqualify', stats = stats)
+    keys = list(strats.values())
+    d.rng.shuffle(keys)
+    keys = keys[rotation:] + keys[:rotation]
+    for j, s in enumerate(keys):
+        d.gameState.players[j].strategy = s
+    # play a game and get the key of the losing strategy
+    return d.gameState.players[d.play()].strategy.tourney_key
+
+def _save_json(path, obj):
+    """Replace the file at path with obj as JSON, atomically."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+def _play_subset(args):
+    """Worker for GrandTourney's process pool: play one subset's Tourney
+    quietly and return its losses."""
+    subset, strats, games, check, prob, prior, seed, duplicate = args
+    lost = Tourney(strats, games, check, prob, prior, seed = seed,
+                   verbose = False, duplicate = duplicate).play()
+    return subset, lost
+
+def _play_games(args):
+    """Worker for Tourney's process pool. The strategies arrive pickled, so
+    each shard plays with its own fresh instances. Returns the losers in
+    game order, and the shard's GameStats if it was instrumented."""
+    strats, start, games, seed, duplicate, timeLimit, instrument = args
+    stats = GameStats() if instrument else None
+    losers = [_play_game(strats, *_game_args(seed, g, len(strats), duplicate),
+                         timeLimit = timeLimit, stats = stats)
+              for g in range(start, start + games)]
+    return losers, stats
+
+@contextmanager
+def gamePool(workers, cluster = None):
+    """The pool to play games on: the cluster if there is one, else a
+    process pool of `workers` processes, or None for one worker, to play in
+    this process. A process pool made here is closed on leaving."""
+    if cluster is not None or workers <= 1:
+        yield cluster
+        return
+    from multiprocessing import Pool
+    pool = Pool(workers)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        pool.join()
+
+def poolWidth(pool, workers):
+    """How many shards keep the pool busy: its workers, or on a cluster
+    at least as many as are connected."""
+    if pool is None:
+        return 1
+    if hasattr(pool, 'size'):
+        return max(workers, pool.size())
+    return workers
+
+def playRanges(pool, ranges, workers, duplicate = False, timeLimit = None,
+               instrument = False):
+    """Play ranges of games, each a (strats, seed, start, games) tuple, on
+    a pool from gamePool. The ranges are split into shards so the pool's
+    workers share them, and game g of a range is seeded by g, so the
+    results are those of playing it in one go. Returns for each range its
+    losers in game order and, if instrumented, its GameStats.
+
+    >>> from strategies.alexStrategies import FixFoldStrategy
+    >>> strats = {'a': FixFoldStrategy(2), 'b': FixFoldStrategy(4)}
+    >>> for key, value in strats.items():
+    ...     value.tourney_key = key
+    >>> one = playRanges(None, [(strats, 'r', 0, 10)], 1)
+    >>> split = playRanges(None, [(strats, 'r', 0, 4), (strats, 'r', 4, 6)], 4)
+    >>> one[0][0] == split[0][0] + split[1][0]
+    True
+    """
+    shards = max(1, poolWidth(pool, workers) // max(len(ranges), 1))
+    tasks, owners = [], []
+    for r, (strats, seed, start, games) in enumerate(ranges):
+        for i in range(shards):
+            size = games // shards + (i < games % shards)
+            if size:
+                tasks.append((strats, start, size, seed, duplicate, timeLimit,
+                              instrument))
+                owners.append(r)
+                start += size
+    played = (pool.map(_play_games, tasks) if pool is not None
+              else map(_play_games, tasks))
+    results = [([], None) for r in ranges]
+    for r, (losers, stats) in zip(owners, played):
+        merged = results[r][1]
+        if merged is None:
+            merged = stats
+        elif stats:
+            merged.merge(stats)
+        results[r] = (results[r][0] + losers, merged)
+    return results
+
 class Tourney:
 
     def __init__(self, strategies, games = 50000, check = 100, prob = 0.95,
-                 prior = 500):
+                 prior = 500, workers = 1, seed = None, verbose = True,
+                 duplicate = False, batch = None, adaptive = False,
+                 timeLimit = None, stats = False, checkpoint = None,
+                 checkpointEvery = 5, resume = False, cluster = None):
         self.strats = strategies
         self.n = len(strategies)
         self.games = games
@@ -53,72 +182,294 @@ class Tourney:
         self.lost = dict.fromkeys(list(strategies.keys()), 0)
         self.early = False
         self.interactive = False
+        self.workers = workers
+        # a distributed.Coordinator to play the games on in place of a
+        # local process pool
+        self.cluster = cluster
+        self.verbose = verbose
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.duplicate = duplicate
+        if duplicate:
+            # every check, early stop and the end fall on whole blocks
+            self.games, self.check = self._whole(games), self._whole(check)
+        self.batch = batch
+        # file the state is saved to at most every checkpointEvery seconds
+        # (at the summaries) and at the end; resume continues from it
+        self.checkpoint = checkpoint
+        self.checkpointEvery = checkpointEvery
+        self._saved = time.time()
+        state = None
+        if resume and checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state = json.load(f)
+            if (state['keys'] != list(strategies) or
+                    state['duplicate'] != duplicate):
+                raise ValueError("The checkpoint %s is of a different "
+                                 "tourney." % checkpoint)
+            # games are seeded by their number, so the seed is the whole
+            # random state
+            self.seed = state['seed']
+        self.played = 0
+        # ms per decision; a strategy that overruns it loses the game
+        self.timeLimit = timeLimit
+        # a GameStats of every game played, when instrumented
+        self.stats = GameStats() if stats else None
+        # games after which the next summary and stopping test happen;
+        # adaptive tests come sooner near the threshold, later far from it
+        self.adaptive = adaptive
+        self._next = self.check
+        if numpy:
+            from sequential import DirichletTest, PairedTest
+            self.test = DirichletTest(self.n, prior)
+            if duplicate:
+                self.paired = PairedTest(self.n, seed = str(self.seed))
+        # per-deal loss counts of complete duplicate blocks: their number,
+        # sum and sum of outer products
+        self.keys = list(strategies.keys())
+        self.blocks = 0
+        self._block = [0] * self.n
+        self._bsum = [0] * self.n
+        self._bcross = [[0] * self.n for i in range(self.n)]
         self.nw = max(len(k) for k in strategies.keys()) + 5
         self.rw = 10
+        if state:
+            self._restore(state)
 
     def play(self):
-        for g in range(self.games):
-            d = p.Dealer(self.n, verbose = False, standard = True,
-                         calamity = False)
-            keys = list(self.strats.values())
-            shuffle(keys)
-            for j, s in enumerate(keys):
-                d.gameState.players[j].strategy = s
-            # play a game and get the key of the losing strategy
-            loser = d.gameState.players[d.play()].strategy.tourney_key
-            self.lost[loser] += 1
-            if not (g+1) % self.check:
-                self._summary(g+1)
+        for record in self.stream():
+            pass
+        return self.lost
+
+    def stream(self):
+        """Play the tourney as a generator of progress records: one at each
+        check and, if the last game did not fall on a check, one at the
+        end. Each record is a dict of plain values that json can write:
+        the games played, the losses, P(best) and P(worst) of each
+        strategy as of the last check (when numpy is available), games per
+        second since the last record and whether the tourney has stopped
+        early."""
+        self._clock = (time.time(), self.played)
+        record = None
+        if self.batch:
+            games = self._play_batch()
+        elif self.workers > 1 or self.cluster:
+            games = self._play_parallel()
+        else:
+            games = self._play_serial()
+        for record in games:
+            yield record
+        if record is None or record['games'] != self.played:
+            yield self._progress(self.played)
+        self._save()
+
+    def _play_serial(self):
+        for g in range(self.played, self.games):
+            if self.early:
+                break
+            loser = _play_game(self.strats, *_game_args(self.seed, g, self.n,
+                                                        self.duplicate),
+                               timeLimit = self.timeLimit, stats = self.stats)
+            self._record(g, loser)
+            if g+1 == self._next:
+                yield self._summary(g+1)
             if self.interactive:
                 print('%s lost.' % (loser))
                 try:
                     input('Press Enter to continue.')
                 except SyntaxError:
                     pass
-            if self.early:
-                break
-        return self.lost
+
+    def _play_parallel(self):
+        """Play the games in rounds of `check` games, each round split into
+        one shard per worker, and merge the losses before each summary.
+        Games are seeded by their number, so the results match a serial run
+        with the same seed. On a cluster there are at least as many shards
+        as workers connected."""
+        with gamePool(self.workers, self.cluster) as pool:
+            g = self.played
+            while g < self.games and not self.early:
+                n = min(self._next - g, self.games - g)
+                [(losers, stats)] = playRanges(
+                    pool, [(self.strats, self.seed, g, n)], self.workers,
+                    self.duplicate, self.timeLimit, self.stats is not None)
+                if stats:
+                    self.stats.merge(stats)
+                for loser in losers:
+                    self._record(g, loser)
+                    g += 1
+                if g == self._next:
+                    yield self._summary(g)
+
+    def _play_batch(self):
+        """Play the games `check` at a time in the NumPy batch engine, at
+        most `batch` games in lockstep. Every strategy needs a playBatch
+        method; duplicate mode and stats are not available."""
+        from batchEngine import playGames
+        if self.duplicate:
+            raise ValueError("The batch engine has no duplicate mode.")
+        if self.stats is not None:
+            raise ValueError("The batch engine does not collect stats.")
+        g = self.played
+        while g < self.games and not self.early:
+            n = min(self._next - g, self.games - g)
+            lost = playGames(self.strats, n, gameSeed(self.seed, g),
+                             batch = self.batch)
+            for key in lost:
+                self.lost[key] += lost[key]
+            g += n
+            self.played = g
+            if g == self._next:
+                yield self._summary(g)
+
+    def _record(self, g, loser):
+        """Count the loss of game g."""
+        self.lost[loser] += 1
+        self.played = g + 1
+        if self.duplicate:
+            self._block[self.keys.index(loser)] += 1
+            if not (g+1) % self.n:
+                x = self._block
+                self.blocks += 1
+                for i in range(self.n):
+                    self._bsum[i] += x[i]
+                    for j in range(self.n):
+                        self._bcross[i][j] += x[i] * x[j]
+                self._block = [0] * self.n
+
+    def vPrint(self, args):
+        if self.verbose:
+            print(args)
 
     def _summary(self, g):
-        print("--------------------------------")
-        print("Games Played:\t" + str(g) + "\n")
-        row = "{:<%d}{:<%d}{:<%d}" % (self.nw, self.rw, self.rw)
-        print(row.format("", "Lost", "Percent"))
-        for key in self.strats:
-            print(row.format(key, str(self.lost[key]), 
-                             '%.3f' % (self.lost[key] / g)))
+        self.vPrint("--------------------------------")
+        self.vPrint("Games Played:\t" + str(g) + "\n")
+        if self.stats:
+            row = "{:<%d}{:<%d}{:<%d}{:<%d}" % (self.nw, self.rw, self.rw,
+                                                self.rw + 2)
+            self.vPrint(row.format("", "Lost", "Percent", "ms/decision"))
+            for key in self.strats:
+                ms = self.stats.msPerDecision(key)
+                self.vPrint(row.format(key, str(self.lost[key]),
+                                       '%.3f' % (self.lost[key] / g),
+                                       '-' if ms is None else '%.3f' % ms))
+            self.vPrint('')
+            for line in self.stats.report():
+                self.vPrint(line)
+        else:
+            row = "{:<%d}{:<%d}{:<%d}" % (self.nw, self.rw, self.rw)
+            self.vPrint(row.format("", "Lost", "Percent"))
+            for key in self.strats:
+                self.vPrint(row.format(key, str(self.lost[key]),
+                                       '%.3f' % (self.lost[key] / g)))
     
+        self._next = g + self.check
         if numpy:
             self._report_probs()
+            if self.adaptive:
+                step = self.test.nextCheck(g, self.best, self.worst,
+                                           self.prob, self.check)
+                self._next = g + (self._whole(step) if self.duplicate
+                                  else step)
+        if time.time() - self._saved >= self.checkpointEvery:
+            self._save()
+        return self._progress(g)
+
+    def _progress(self, g):
+        now = time.time()
+        since, before = self._clock
+        self._clock = (now, g)
+        record = {'games': g, 'lost': dict(self.lost),
+                  'gamesPerSec': (g - before) / max(now - since, 1e-9),
+                  'early': self.early}
+        if hasattr(self, 'best'):
+            record['best'] = dict(zip(self.keys, map(float, self.best)))
+            record['worst'] = dict(zip(self.keys, map(float, self.worst)))
+        return record
     
     def _report_probs(self):
-            prior = np.repeat(self.prior, self.n)
-            posterior = prior + np.array(list(self.lost.values()))
             keys = list(self.lost.keys())
-            N = 10000
-            draws = np.random.dirichlet(posterior, N)
-            best = np.bincount(np.argmin(draws, axis = 1),
-                               minlength = self.n) / N
-            worst = np.bincount(np.argmax(draws, axis = 1),
-                                minlength = self.n) / N
+            if self.duplicate and self.blocks >= self.paired.minBlocks:
+                best, worst = self.paired.probs(*self._paired_posterior(),
+                                                df = self.blocks - 1)
+            else:
+                best, worst = self.test.probs(self.lost.values())
+            self.best, self.worst = best, worst
     
-            print()
+            self.vPrint('')
             row = "{:<%d}{:<%d}{:<%d}" % (self.nw, self.rw, self.rw)
-            print(row.format("", "P(best)", "P(worst)"))
+            self.vPrint(row.format("", "P(best)", "P(worst)"))
             for i, key in enumerate(self.strats):
-                print(row.format(key,'%.3f' % best[keys.index(key)],
-                                 '%.3f' % worst[keys.index(key)]))
-            if max(best) > self.prob and max(worst) > self.prob:
-                print("Stopping early due to high probabilities "
-                      "of best and worst. (Threshold set to %s)" % 
-                      str(self.prob))
+                self.vPrint(row.format(key,'%.3f' % best[keys.index(key)],
+                                       '%.3f' % worst[keys.index(key)]))
+            if self.test.stop(best, worst, self.prob):
+                self.vPrint("Stopping early due to high probabilities "
+                            "of best and worst. (Threshold set to %s)" %
+                            str(self.prob))
                 self.early = True
             
 
+    def _save(self):
+        """Write the state of the tourney to the checkpoint file, atomically:
+        a crash leaves either the old checkpoint or the new one."""
+        self._saved = time.time()
+        if not self.checkpoint:
+            return
+        state = {'keys': self.keys, 'seed': self.seed,
+                 'duplicate': self.duplicate, 'games': self.games,
+                 'played': self.played, 'next': self._next,
+                 'early': self.early, 'lost': self.lost,
+                 'blocks': self.blocks, 'block': self._block,
+                 'bsum': self._bsum, 'bcross': self._bcross}
+        if hasattr(self, 'best'):
+            # the probabilities of the last check, for the progress records
+            # of a resumed tourney
+            state['best'] = [float(b) for b in self.best]
+            state['worst'] = [float(w) for w in self.worst]
+        if self.stats:
+            state['stats'] = {'counts': self.stats.counts,
+                              'times': self.stats.times,
+                              'cpu': self.stats.cpu,
+                              'decisions': self.stats.decisions}
+        _save_json(self.checkpoint, state)
+
+    def _restore(self, state):
+        self.played = state['played']
+        self._next = state['next']
+        self.early = state['early']
+        self.lost.update(state['lost'])
+        self.blocks = state['blocks']
+        self._block = state['block']
+        self._bsum = state['bsum']
+        self._bcross = state['bcross']
+        if 'best' in state:
+            self.best, self.worst = state['best'], state['worst']
+        if self.stats and 'stats' in state:
+            for key, value in state['stats'].items():
+                setattr(self.stats, key, value)
+        self.vPrint("Resuming after %d games from %s." % (self.played,
+                                                          self.checkpoint))
+
+    def _whole(self, games):
+        """games, rounded up to whole duplicate blocks."""
+        return -(-games // self.n) * self.n
+
+    def _paired_posterior(self):
+        """Mean and covariance of the mean losses per deal in duplicate
+        mode. Deals are the independent units, so the spread comes from the
+        covariance of the per-deal loss counts, where the luck of the deal
+        cancels out."""
+        B = self.blocks
+        mean = np.array(self._bsum) / B
+        cov = (np.array(self._bcross) / B - np.outer(mean, mean)) * B / (B-1)
+        return mean, cov / B
+
 class GrandTourney:
 
     def __init__(self, strategies, games = 100, check = 500, prob = 0.95,
-                 prior = 500):
+                 prior = 500, workers = 1, seed = None, duplicate = False,
+                 checkpoint = None, resume = False, cluster = None,
+                 store = None, sample = None, seats = MAX_SEATS,
+                 adaptive = False):
         self.strats = strategies
         self.n = len(strategies)
         self.games = games
@@ -126,10 +477,37 @@ class GrandTourney:
         self.prob = prob
         self.prior = prior
         self.results = {}
+        self.workers = workers
+        # a distributed.Coordinator to play the subsets on
+        self.cluster = cluster
+        self.duplicate = duplicate
+        self.seed = random.getrandbits(32) if seed is None else seed
+        # tables have at most `seats` players; with sample, each strategy
+        # sits at about that many sampled tables of each size instead of
+        # every subset being played
+        self.sample = sample
+        self.seats = seats
+        # adaptive: share out games `check` at a time among the tables that
+        # most firm up the Overall order, until it holds with prob, instead
+        # of running each table's Tourney to its own end (see matchmaker)
+        self.adaptive = adaptive
+        self.played = 0
+        # JSON lines file with a header and the losses of each subset as it
+        # is completed; resume skips the subsets already in it
+        self.checkpoint = checkpoint
+        self._done = {}
+        if checkpoint and resume and os.path.exists(checkpoint):
+            self._load()
+        # a resultsStore.ResultsStore file of the subsets played before, by
+        # the identities of their strategies; those found are not replayed
+        self.store = None
+        self.reused = 0
+        if store:
+            self._reuse(store)
+        if checkpoint:
+            self._rewrite()
         for strat in self.strats:
             self.strats[strat].gt_indices = {}
-            for i in range(2, self.n+1):
-                self.strats[strat].gt_indices[i] = []
             self.strats[strat].gt_games = 0
             self.strats[strat].gt_losses = 0
         self.nw = max(len(name) for name in self.strats) + 5
@@ -137,22 +515,243 @@ class GrandTourney:
             
     def _create_subsets(self):
         keys = list(self.strats.keys())
-        return chain.from_iterable(combinations(keys, n)
-                                   for n in range(2, len(keys)+1))
+        sizes = range(2, min(len(keys), self.seats)+1)
+        if self.sample:
+            return self._sample_subsets(keys, sizes)
+        return chain.from_iterable(combinations(keys, n) for n in sizes)
+
+    def _sample_subsets(self, keys, sizes):
+        """About sample * n / k distinct tables of each size k, which keeps
+        the number of games linear in the number of strategies. Every
+        strategy sits at nearly the same number of tables of each size, and
+        each table is built greedily from the pairs that have met least so
+        far, at tables of any size. That evens out how often pairs meet in
+        all, but not at each size: when a size has fewer seats side by side
+        than there are pairs, some pairs never meet at it. Seats are not part
+        of the design: every game shuffles the players into seats. The tables
+        depend only on the seed.
+
+        >>> from strategies.alexStrategies import FixFoldStrategy
+        >>> field = dict(('s%d' % i, FixFoldStrategy()) for i in range(12))
+        >>> g = GrandTourney(field, sample = 2, seed = 0)
+        >>> tables = list(g._create_subsets())
+        >>> meets = [sum(1 for t in tables if a in t and b in t)
+        ...          for a, b in combinations(field, 2)]
+        >>> len(tables), min(meets), max(meets)
+        (42, 4, 7)
+        """
+        rng = random.Random('%s-tables' % self.seed)
+        tables = []
+        # how often each pair has met, at tables of every size
+        met = {}
+        for k in sizes:
+            target = -(-self.sample * len(keys) // k)
+            # the most tables of this size a strategy sits at
+            cap = -(-target * k // len(keys))
+            seen = set()
+            sat = dict.fromkeys(keys, 0)
+            for attempt in range(10 * target):
+                if len(seen) == target:
+                    break
+                order = keys[:]
+                rng.shuffle(order)
+                # start from the pair that has met least, then add whoever
+                # has met the table least
+                free = [s for s in order if sat[s] < cap]
+                if len(free) < 2: free = order
+                table = list(min(combinations(free, 2),
+                                 key = lambda p: met.get(p, 0)))
+                while len(table) < k:
+                    free = [s for s in order if s not in table]
+                    free = [s for s in free if sat[s] < cap] or free
+                    table.append(min(free, key = lambda s: (sum(
+                        met.get((s, t), 0) for t in table), sat[s])))
+                table = tuple(s for s in keys if s in table)
+                if table in seen:
+                    continue
+                seen.add(table)
+                tables.append(table)
+                for s in table:
+                    sat[s] += 1
+                    for t in table:
+                        met[(s, t)] = met.get((s, t), 0) + 1
+        return tables
         
     def play(self, stop = False):
+        for record in self.stream(stop):
+            pass
+        self._grand_tourney_report()
+
+    def stream(self, stop = False):
+        """Play the subsets as a generator of records, one for each subset
+        as it is completed: {'subset': [keys], 'lost': {key: losses}}.
+        An adaptive GrandTourney instead yields one record per round of
+        tables: {'games': games played at all tables, 'order': [keys],
+        'confidence': [P(each key is below the next)]}."""
+        if self.adaptive:
+            yield from self._play_adaptive()
+            return
+        if self.workers > 1 or self.cluster:
+            yield from self._play_parallel()
+            return
         subsets = self._create_subsets()
-        for subset in subsets:
-            self.results[subset] = Tourney({s:self.strats[s]
+        for i, subset in enumerate(subsets):
+            if subset in self._done:
+                self.results[subset] = self._done[subset]
+                continue
+            # fresh copies, as a worker unpickles, so that a strategy that
+            # learns as it plays starts every subset the same
+            self.results[subset] = Tourney({s:deepcopy(self.strats[s])
                 for s in self.strats if s in subset}, 
-                self.games, self.check, self.prob, self.prior).play()
+                self.games, self.check, self.prob, self.prior,
+                seed = gameSeed(self.seed, i),
+                duplicate = self.duplicate).play()
+            record = {'subset': list(subset), 'lost': self.results[subset]}
+            self._append(record)
+            yield record
             if stop:
                 try:
                     input("Tourney ended. Press Enter to continue.")
                 except:
                     pass
-        self._grand_tourney_report()
     
+    def _play_parallel(self):
+        """Run the subsets on a process pool or a cluster. Larger subsets
+        take longer, so they are handed out first, and each worker takes the
+        next subset as soon as it finishes one."""
+        subsets = list(self._create_subsets())
+        tasks = [(subset, {s: self.strats[s] for s in subset}, self.games,
+                  self.check, self.prob, self.prior,
+                  gameSeed(self.seed, i), self.duplicate)
+                 for i, subset in enumerate(subsets)
+                 if subset not in self._done]
+        tasks.sort(key = lambda t: len(t[0]), reverse = True)
+        done = dict(self._done)
+        with gamePool(self.workers, self.cluster) as pool:
+            for subset, lost in pool.imap_unordered(_play_subset, tasks, 1):
+                done[subset] = lost
+                record = {'subset': list(subset), 'lost': lost}
+                self._append(record)
+                yield record
+        for subset in subsets:
+            self.results[subset] = done[subset]
+
+    def _play_adaptive(self):
+        """Give every table `check` games, then in rounds give `check` more
+        to the tables with the most to add to the confidence of the Overall
+        order, as many tables a round as there are workers, until every
+        comparison in the order holds with prob or no table below `games`
+        games would help. Each round's tables are recorded as in the other
+        modes, and the round yields a record of the games played, the
+        order and the confidence of each comparison in it."""
+        from matchmaker import Posterior
+        tables = list(self._create_subsets())
+        lost = [[self._done.get(t, {}).get(s, 0) for s in t] for t in tables]
+        # the games played so far, those of a resumed run included
+        self.played = sum(map(sum, lost))
+        # the most games a table may have: in duplicate mode whole blocks
+        caps = [self.games - self.games % len(t) if self.duplicate
+                else self.games for t in tables]
+        with gamePool(self.workers, self.cluster) as pool:
+            batch = [i for i in range(len(tables)) if not sum(lost[i])]
+            while True:
+                ranges = []
+                for i in batch:
+                    k = len(tables[i])
+                    played = sum(lost[i])
+                    size = self.check
+                    if self.duplicate:
+                        size = -(-size // k) * k
+                    size = min(size, caps[i] - played)
+                    ranges.append(({s: self.strats[s] for s in tables[i]},
+                                   gameSeed(self.seed, i), played, size))
+                done = playRanges(pool, ranges, self.workers, self.duplicate)
+                for i, (losers, stats) in zip(batch, done):
+                    for loser in losers:
+                        lost[i][tables[i].index(loser)] += 1
+                    self.played += len(losers)
+                    self._append({'subset': list(tables[i]),
+                                  'lost': dict(zip(tables[i], lost[i]))})
+                post = Posterior(self.strats, tables, lost, self.prior)
+                order, conf = post.confidence()
+                yield {'games': self.played, 'order': order,
+                       'confidence': [float(p) for p in conf]}
+                if min(conf) >= self.prob:
+                    break
+                gains = post.gains(self.check, self.prob)
+                open_ = [i for i in range(len(tables))
+                         if sum(lost[i]) < caps[i] and gains[i] > 0]
+                if not open_:
+                    break
+                open_.sort(key = lambda i: -gains[i])
+                batch = open_[:poolWidth(pool, self.workers)]
+        for t, losses in zip(tables, lost):
+            self.results[t] = dict(zip(t, losses))
+
+    def _load(self):
+        """Read the subsets completed before from the checkpoint. A last
+        line cut short by a crash is dropped."""
+        from resultSink import read
+        records = read(self.checkpoint)
+        header = next(records, {})
+        if (header.get('keys') != list(self.strats) or
+                header.get('games') != self.games or
+                header.get('duplicate') != self.duplicate or
+                header.get('sample') != self.sample or
+                header.get('adaptive', False) != self.adaptive):
+            raise ValueError("The checkpoint %s is of a different "
+                             "grand tourney." % self.checkpoint)
+        self.seed = header['seed']
+        for record in records:
+            self._done[tuple(record['subset'])] = record['lost']
+
+    def _rewrite(self):
+        lines = [{'keys': list(self.strats), 'games': self.games,
+                  'duplicate': self.duplicate, 'seed': self.seed,
+                  'sample': self.sample, 'adaptive': self.adaptive}]
+        for subset, lost in self._done.items():
+            lines.append({'subset': list(subset), 'lost': lost})
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            for line in lines:
+                f.write(json.dumps(line) + '\n')
+        os.replace(tmp, self.checkpoint)
+
+    def _reuse(self, path):
+        from resultsStore import ResultsStore, identity
+        self.store = ResultsStore(path)
+        self._ids = {key: identity(s) for key, s in self.strats.items()}
+        self._settings = {'games': self.games, 'check': self.check,
+                          'prob': self.prob, 'prior': self.prior,
+                          'duplicate': self.duplicate}
+        if self.adaptive:
+            # the losses of an adaptive run are where it stood, not a
+            # finished Tourney's
+            self._settings['adaptive'] = True
+        for subset in self._create_subsets():
+            ids = self._storeIds(subset)
+            if subset in self._done or not ids:
+                continue
+            lost = self.store.get(ids, self._settings)
+            if lost is not None:
+                self._done[subset] = {s: lost[self._ids[s]] for s in subset}
+                self.reused += 1
+
+    def _storeIds(self, subset):
+        """The identities of a subset's strategies, or None if two are the
+        same and their losses could not be told apart in the store."""
+        ids = [self._ids[s] for s in subset]
+        return ids if len(set(ids)) == len(ids) else None
+
+    def _append(self, record):
+        subset = record['subset']
+        if self.store is not None and self._storeIds(subset):
+            self.store.put(self._storeIds(subset), self._settings,
+                           {self._ids[s]: record['lost'][s] for s in subset})
+        if self.checkpoint:
+            with open(self.checkpoint, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
     def _tourney_report(self, results):
         row = "{:<%d}"*4 % (self.nw, self.rw, self.rw, self.rw)
         print(row.format("","Losses","Percent","Index"))
@@ -163,7 +762,8 @@ class GrandTourney:
             index = (results[key] / total * len(results))
             self.strats[key].gt_games += total
             self.strats[key].gt_losses += losses
-            self.strats[key].gt_indices[len(results)].append(index)
+            self.strats[key].gt_indices.setdefault(len(results),
+                                                   []).append(index)
             print(row.format(key, str(losses), '%.3f' % percent,
                              '%.3f' % index))
         print('\n')
@@ -173,8 +773,13 @@ class GrandTourney:
         print("|                    Grand Tourney Results                  |")
         print("-------------------------------------------------------------")
         print("Total Tournaments Played: " + str(len(self.results)))
+        if self.store is not None:
+            print("Reused from the results store: " + str(self.reused))
+        if self.adaptive:
+            print("Games played: " + str(self.played))
         
-        for i in range(2, self.n+1):
+        sizes = sorted(set(len(subset) for subset in self.results))
+        for i in sizes:
             print("--------------------------------------------")
             print(str(i) + "-Player Tournaments:")
             for result in self.results.values():
@@ -189,20 +794,21 @@ class GrandTourney:
         row = "{:<%d}"*4 % (self.nw, self.rw, self.rw, self.rw)
         for key in self.strats:
             strat = self.strats[key]
-            strat.gt_means = []
-            for i in range(2, self.n+1):
-                strat.gt_means.append(sum(strat.gt_indices[i]) /
-                                      len(strat.gt_indices[i]))
-            overall[key] = sum(strat.gt_means) / len(strat.gt_means)
-            strat.gt_means.append(overall[key])
-            for i in range(len(strat.gt_means)):
-                strat.gt_means[i] = '%.3f' % strat.gt_means[i]
+            means = [sum(strat.gt_indices[i]) / len(strat.gt_indices[i])
+                     for i in sizes if strat.gt_indices.get(i)]
+            overall[key] = sum(means) / len(means)
+            # a sampled design can leave a strategy out of some size
+            strat.gt_means = ['%.3f' % (sum(strat.gt_indices[i]) /
+                                        len(strat.gt_indices[i]))
+                              if strat.gt_indices.get(i) else '-'
+                              for i in sizes]
+            strat.gt_means.append('%.3f' % overall[key])
                 
         
         order = sorted(overall, key=overall.get)
-        lengths = tuple([self.nw] + [self.rw] * self.n) 
-        row = "{:<%d}"*(self.n+1) % lengths 
-        headers = tuple(['Player'] + [str(i) for i in range(2, self.n+1)] +
+        lengths = tuple([self.nw] + [self.rw] * (len(sizes)+1)) 
+        row = "{:<%d}"*(len(sizes)+2) % lengths 
+        headers = tuple(['Player'] + [str(i) for i in sizes] +
                         ['Overall'])
         print(row.format(*headers))
         for s in order:
@@ -210,24 +816,14 @@ class GrandTourney:
             
 
 if __name__ == "__main__":
-    log = False
-    if(log):
-        import sys
-    
-        class Tee(object):
-            def __init__(self, *files):
-                self.files = files
-            def write(self, obj):
-                for f in self.files:
-                    f.write(obj)
-    
-        f = open('tourney_log.txt', 'w')
-        original = sys.stdout
-        sys.stdout = Tee(sys.stdout, f)
-    
-    tourney = Tourney(strategies, games = 1000000, check = 1000, prob = 0.99)
-    tourney.play()
-    
-    if(log):
-        f.close()
-        sys.stdout = original
+    from multiprocessing import cpu_count
+    from resultSink import JsonlSink
+    # a run that is cut short picks up from its checkpoint when restarted;
+    # delete tourney_checkpoint.json to start over
+    tourney = Tourney(strategies, games = 1000000, check = 1000, prob = 0.99,
+                      workers = cpu_count(),
+                      checkpoint = 'tourney_checkpoint.json', resume = True)
+    # progress at every check, for resultSink.read or any JSON lines reader
+    with JsonlSink('tourney_log.jsonl') as sink:
+        for record in tourney.stream():
+            sink.write(record)